@@ -0,0 +1,38 @@
+'''
+The spider's crawl against the local ThrottlingServer of stub_server.py: the number of requests in flight must settle
+around the server's capacity, and the unexpected pages must end up in the dead letters without stopping the crawl.
+'''
+import pytest
+from spider_tools.spider_IMDb import spider_IMDb
+from spider_tools.snapshot_store import SnapshotStore
+from stub_server import ThrottlingServer
+
+MOVIES = 120
+CAPACITY = 4
+BROKEN = (13, 113)
+
+
+@pytest.fixture
+def server(title_pages):
+    with ThrottlingServer(title_pages['title_page.html'], MOVIES, CAPACITY, broken=BROKEN) as server:
+        yield server
+
+
+def bench_create_excel_throttled(benchmark, server, tmp_path):
+    spider = spider_IMDb(movie_number=MOVIES, savepath=str(tmp_path / 'IMDb.xls'),
+                         snapshot_folder=str(tmp_path / 'snapshots'), max_concurrency=16)
+    spider.IMDb_chart_url = server.url + 'chart'
+    spider.baseURL = server.url
+    benchmark.pedantic(spider.create_excel, rounds=1)
+
+    stats = spider.controller.stats()
+    assert stats['success'] == MOVIES - len(BROKEN)
+    # the limit backs off to the capacity instead of staying at max_concurrency
+    assert max(concurrency for _, concurrency in spider.controller.history) <= CAPACITY + 2
+    assert server.peak <= CAPACITY + 2
+    assert server.statuses[429] < MOVIES // 4
+    assert sorted(url for url, error, html in spider.dead_letters) == [server.title_url(i) for i in BROKEN]
+    # the movies after a dead letter keep their chart position
+    ranks = sorted(int(rank) for rank in SnapshotStore(str(tmp_path / 'snapshots')).records['rank'])
+    assert ranks == [i + 1 for i in range(MOVIES) if i not in BROKEN]
+
@@ -0,0 +1,31 @@
+from spider_tools.Data_Visualization import Data
+
+
+def bench_cleaning_imdb(benchmark, imdb_xls, imdb_data):
+    data = Data(imdb_xls)
+    benchmark.pedantic(data.Cleaning, setup=lambda: ((imdb_data.copy(),), {}), rounds=20)
+
+
+def bench_cleaning(benchmark, imdb_xls, synthetic_data, rows):
+    data = Data(imdb_xls)
+    benchmark.pedantic(data.Cleaning, setup=lambda: ((synthetic_data.copy(),), {}), rounds=3 if rows <= 10000 else 1)
+
+
+def bench_statistics(benchmark, imdb_xls, synthetic_data):
+    data = Data(imdb_xls)
+    cleaned = data.Cleaning(synthetic_data)
+    benchmark(data.Statistics, cleaned)
+
+
+def bench_visualization_imdb(benchmark, imdb_xls, workdir, imdb_data):
+    data = Data(imdb_xls)
+    cleaned = data.Cleaning(imdb_data)
+    statistics = data.Statistics(cleaned)
+    benchmark.pedantic(data.Visualization, args=(cleaned, statistics), rounds=3)
+
+
+def bench_visualization(benchmark, imdb_xls, workdir, synthetic_data):
+    data = Data(imdb_xls)
+    cleaned = data.Cleaning(synthetic_data)
+    statistics = data.Statistics(cleaned)
+    benchmark.pedantic(data.Visualization, args=(cleaned, statistics), rounds=1)
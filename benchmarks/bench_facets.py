@@ -0,0 +1,40 @@
+import pytest
+from spider_tools.facets import FacetIndex, BitMap
+
+BACKENDS = ['numpy'] + (['roaring'] if BitMap is not None else [])
+# the 1990s non-English dramas rated R with score >= 8.5 and budget under $10M
+FILTERS = {'Genre': 'Drama', 'Era': '1990s', 'Film rating': 'R'}
+RANGES = {'Score': (8.5, None), 'Budget': (1, 1e7)}
+EXCLUDE = {'Language': 'English'}
+
+__indexes = {}
+
+
+@pytest.fixture
+def index(synthetic_data, rows, backend):
+    '''
+    the facet index of the synthetic dataset, built once per session
+    '''
+    if (rows, backend) not in __indexes:
+        __indexes[rows, backend] = FacetIndex(synthetic_data, backend=backend)
+    return __indexes[rows, backend]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def bench_build(benchmark, synthetic_data, rows, backend):
+    benchmark.pedantic(FacetIndex, args=(synthetic_data,), kwargs={'backend': backend}, rounds=1)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def bench_query(benchmark, index, backend):
+    benchmark(index.query, FILTERS, RANGES, EXCLUDE)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def bench_range(benchmark, index, backend):
+    benchmark(index.range, 'Score', 8.2, 8.8)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def bench_facet_counts(benchmark, index, backend):
+    benchmark(index.facet_counts, index.query(FILTERS, RANGES, EXCLUDE))
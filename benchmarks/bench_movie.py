@@ -0,0 +1,54 @@
+import pytest
+from spider_tools import movie as movie_module
+from spider_tools.movie import Movie
+
+# Movie ranks with row by row loops over the whole frame, larger synthetic sizes would take minutes per round
+MOVIE_MAX_ROWS = 10000
+TITLE = 'Inception'
+
+
+@pytest.fixture
+def output_folder(workdir, monkeypatch):
+    monkeypatch.setattr(movie_module, 'Folder', str(workdir) + '/')
+    return workdir
+
+
+def matched_movie(imdb_xls, data, title):
+    movie = Movie(imdb_xls, title)
+    # pandas reads the empty Language cell of "The General" as NaN
+    movie.df = data.fillna(' ')
+    movie.match_title()
+    return movie
+
+
+def bench_match_title_imdb(benchmark, imdb_xls, imdb_data):
+    benchmark.pedantic(matched_movie, args=(imdb_xls, imdb_data, TITLE), rounds=5)
+
+
+def bench_match_title(benchmark, imdb_xls, synthetic_data, rows):
+    if rows > MOVIE_MAX_ROWS:
+        pytest.skip('Movie.match_title is too slow above %d rows' % MOVIE_MAX_ROWS)
+    benchmark.pedantic(matched_movie, args=(imdb_xls, synthetic_data, synthetic_data['Title'][0]), rounds=1)
+
+
+def bench_set_rank_imdb(benchmark, imdb_xls, imdb_data):
+    movie = matched_movie(imdb_xls, imdb_data, TITLE)
+    benchmark.pedantic(movie.set_rank, rounds=5)
+
+
+def bench_set_rank(benchmark, imdb_xls, synthetic_data, rows):
+    if rows > MOVIE_MAX_ROWS:
+        pytest.skip('Movie.set_rank is too slow above %d rows' % MOVIE_MAX_ROWS)
+    movie = matched_movie(imdb_xls, synthetic_data, synthetic_data['Title'][0])
+    benchmark.pedantic(movie.set_rank, rounds=1)
+
+
+def bench_generate_histogram_imdb(benchmark, imdb_xls, output_folder, imdb_data):
+    movie = matched_movie(imdb_xls, imdb_data, TITLE)
+    benchmark.pedantic(movie.generate_histogram, rounds=3)
+
+
+def bench_output_pdf_imdb(benchmark, imdb_xls, output_folder, imdb_data):
+    movie = matched_movie(imdb_xls, imdb_data, TITLE)
+    movie.generate_histogram()
+    benchmark.pedantic(movie.output_pdf, rounds=3)
@@ -0,0 +1,65 @@
+'''
+PosterStore.fetch_all() against the local StaticServer of stub_server.py: posters in any format end up as JPEG
+thumbnails, a url shared by several titles and identical images are fetched and stored once, and broken posters
+are reported without stopping the others.
+'''
+import io
+import os
+import pytest
+from PIL import Image
+from spider_tools.poster_store import PosterStore, THUMBNAIL_SIZE
+from stub_server import StaticServer
+
+POSTERS = 60
+FORMATS = [('JPEG', 'image/jpeg'), ('PNG', 'image/png'), ('WEBP', 'image/webp')]
+
+
+def poster(number, image_format):
+    '''
+    a full size poster in the given format
+    '''
+    image = Image.new('RGB', (1000, 1480), ((number * 40) % 256, (number * 90) % 256, (number * 150) % 256))
+    output = io.BytesIO()
+    image.save(output, format=image_format)
+    return output.getvalue()
+
+
+@pytest.fixture
+def server():
+    files = {}
+    for i in range(POSTERS):
+        # every tenth poster is a copy of the previous one under another url
+        if i % 10 == 9:
+            files['/poster/%d' % i] = files['/poster/%d' % (i - 1)]
+            continue
+        image_format, content_type = FORMATS[i % len(FORMATS)]
+        files['/poster/%d' % i] = (content_type, poster(i, image_format))
+    files['/poster/broken'] = ('image/jpeg', b'<html>not an image</html>')
+    with StaticServer(files) as server:
+        yield server
+
+
+def bench_fetch_all(benchmark, server, tmp_path):
+    # two titles share the url of every fifth poster, one title has a poster that is not an image, one a missing one
+    poster_urls = {'Movie %d' % i: '%s/poster/%d' % (server.url, i) for i in range(POSTERS)}
+    poster_urls.update({'Copy %d' % i: '%s/poster/%d' % (server.url, i) for i in range(0, POSTERS, 5)})
+    poster_urls['Broken'] = server.url + '/poster/broken'
+    poster_urls['Missing'] = server.url + '/poster/missing'
+    store = PosterStore(str(tmp_path / 'posters'))
+    failed = benchmark.pedantic(store.fetch_all, args=(poster_urls,), rounds=1)
+
+    assert sorted(failed) == ['Broken', 'Missing']
+    assert all(count == 1 for count in server.requests.values())
+    for title in poster_urls:
+        if title in failed:
+            assert store.thumbnail_path(title) is None
+            continue
+        with Image.open(store.thumbnail_path(title)) as image:
+            assert image.format == 'JPEG'
+            assert image.size[0] <= THUMBNAIL_SIZE[0] and image.size[1] <= THUMBNAIL_SIZE[1]
+    # the copies under another url are stored once
+    assert len([name for name in os.listdir(str(tmp_path / 'posters')) if name.endswith('.jpg')]) \
+        == POSTERS - POSTERS // 10
+    # the titles already in the store are not fetched again
+    assert PosterStore(str(tmp_path / 'posters')).fetch_all(poster_urls).keys() == failed.keys()
+    assert server.requests['/poster/0'] == 1
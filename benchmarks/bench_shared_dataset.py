@@ -0,0 +1,104 @@
+'''
+Worker startup time and memory of the shared Arrow dataset against pickling the DataFrame into every worker.
+bench_attach measures starting the workers until every one can use the Budget column, by attaching to the memory
+mapped file or by unpickling the DataFrame it was sent. The median time a worker needs for that, its unique memory
+(USS) and the proportional memory (PSS) of all workers are saved in the extra_info of the benchmark. With the shared
+dataset the attach time and the USS per worker stay flat as the worker count grows, because the columns are pages of
+one memory mapped file.
+'''
+import time
+import pickle
+import statistics
+import multiprocessing as mp
+import pytest
+from spider_tools.shared_dataset import normalize, publish, SharedDataset
+
+WORKERS = [1, 4]
+
+
+def memory_kb():
+    '''
+    (USS, PSS) of the current process in kB, from /proc/self/smaps_rollup (Linux)
+    '''
+    values = {}
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    values[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss, maxrss
+    return values.get('Private_Clean', 0) + values.get('Private_Dirty', 0), values.get('Pss', 0)
+
+
+def shared_worker(path, queue):
+    started = time.perf_counter()
+    dataset = SharedDataset(path)
+    budget = dataset.numeric('Budget')
+    ready = time.perf_counter()
+    total = float(budget.sum())
+    queue.put((ready - started, memory_kb(), total))
+
+
+def pickled_worker(payload, queue):
+    started = time.perf_counter()
+    data = pickle.loads(payload)
+    budget = data['Budget'].to_numpy()
+    ready = time.perf_counter()
+    total = float(budget.sum())
+    queue.put((ready - started, memory_kb(), total))
+
+
+def run(mode, workers, data, path):
+    context = mp.get_context('spawn')
+    queue = context.Queue()
+    processes = []
+    payload = pickle.dumps(data) if mode == 'pickled' else None
+    for _ in range(workers):
+        if mode == 'shared':
+            process = context.Process(target=shared_worker, args=(path, queue))
+        else:
+            process = context.Process(target=pickled_worker, args=(payload, queue))
+        process.start()
+        processes.append(process)
+    results = [queue.get() for _ in range(workers)]
+    for process in processes:
+        process.join()
+    attach = statistics.median(result[0] for result in results)
+    uss = sum(result[1][0] for result in results) / 1024 / workers
+    pss = sum(result[1][1] for result in results) / 1024
+    totals = [result[2] for result in results]
+    return attach, uss, pss, totals
+
+
+@pytest.fixture
+def normalized(synthetic_data):
+    return normalize(synthetic_data)
+
+
+@pytest.fixture
+def published(normalized, tmp_path):
+    return publish(normalized, str(tmp_path / 'imdb_benchmark.arrow'))
+
+
+def bench_normalize(benchmark, synthetic_data):
+    benchmark.pedantic(normalize, args=(synthetic_data,), rounds=1)
+
+
+def bench_publish(benchmark, normalized, tmp_path):
+    path = benchmark.pedantic(publish, args=(normalized, str(tmp_path / 'imdb_benchmark.arrow')), rounds=1)
+    dataset = SharedDataset(path)
+    assert len(dataset) == len(normalized)
+    dataset.close()
+
+
+
+@pytest.mark.parametrize('workers', WORKERS)
+@pytest.mark.parametrize('mode', ['shared', 'pickled'])
+def bench_attach(benchmark, normalized, published, mode, workers):
+    attach, uss, pss, totals = benchmark.pedantic(run, args=(mode, workers, normalized, published), rounds=1)
+    benchmark.extra_info.update({'attach_ms': attach * 1000, 'uss_per_worker_mb': uss, 'total_pss_mb': pss})
+    assert totals == pytest.approx([float(normalized['Budget'].sum())] * workers)
@@ -0,0 +1,11 @@
+from spider_tools.spider_IMDb import spider_IMDb
+
+
+def bench_get_data(benchmark, title_pages):
+    '''
+    parse every saved title page, the work __get_data__ does after the request
+    '''
+    def parse_all():
+        return [spider_IMDb.__parse_data__(html) for html in title_pages.values()]
+    movies = benchmark(parse_all)
+    assert [movie[0] for movie in movies] == ['Inception', 'The General']
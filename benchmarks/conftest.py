@@ -0,0 +1,115 @@
+'''
+Shared fixtures of the benchmark suite. Run it from the repository root with
+
+    python -m pytest benchmarks --benchmark-json=benchmark_report.json
+
+The synthetic datasets have 10k and 100k rows by default, add --bench-sizes=10000,100000,1000000 for 1M rows.
+Save a baseline with --benchmark-save=baseline, and compare a later run against it with
+--benchmark-compare --benchmark-compare-fail=median:20% which fails when a median got more than 20% slower.
+
+Everything runs offline: the spider is benchmarked on the saved pages in benchmarks/fixtures and on the local
+server of stub_server.py, any other HTTP request made through requests fails the benchmark.
+'''
+import os
+import sys
+from urllib.parse import urlparse
+import pytest
+import requests
+from borb.license.usage_statistics import UsageStatistics
+
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_FOLDER, '..'))
+sys.path.insert(0, BENCHMARK_FOLDER)
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+import synthetic
+
+IMDB_XLS = os.path.join(BENCHMARK_FOLDER, '..', 'data', 'IMDb.xls')
+FIXTURE_FOLDER = os.path.join(BENCHMARK_FOLDER, 'fixtures')
+__datasets = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption('--bench-sizes', default='10000,100000',
+                     help='comma separated sizes of the synthetic datasets, e.g. 10000,100000,1000000')
+
+
+def pytest_generate_tests(metafunc):
+    if 'rows' in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption('--bench-sizes').split(',') if size]
+        metafunc.parametrize('rows', sizes, ids=['%d_rows' % size for size in sizes])
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    send = requests.sessions.Session.request
+
+    def request(session, method, url, *args, **kwargs):
+        if urlparse(url).hostname != '127.0.0.1':
+            raise RuntimeError('benchmarks must run offline')
+        return send(session, method, url, *args, **kwargs)
+    monkeypatch.setattr(requests.sessions.Session, 'request', request)
+    # borb sends usage statistics from a thread on every PDF.dumps(), which the guard above would make fail
+    monkeypatch.setattr(UsageStatistics, 'send_usage_statistics', staticmethod(lambda event: None))
+
+
+@pytest.fixture(autouse=True)
+def no_show(monkeypatch):
+    monkeypatch.setattr(plt, 'show', lambda *args, **kwargs: None)
+    monkeypatch.setattr(matplotlib.figure.Figure, 'show', lambda *args, **kwargs: None)
+    yield
+    plt.close('all')
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    '''
+    an empty working folder with the output folders the package writes to
+    '''
+    for folder in ('plot_html', 'movie_chart', 'movie_pdf'):
+        os.makedirs(tmp_path / folder)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def imdb_xls():
+    '''
+    the path of data/IMDb.xls
+    '''
+    return IMDB_XLS
+
+
+@pytest.fixture
+def imdb_data():
+    '''
+    the raw data of data/IMDb.xls
+    '''
+    return pd.read_excel(IMDB_XLS)
+
+
+@pytest.fixture
+def synthetic_data(rows):
+    '''
+    a synthetic dataset of the parametrized size, generated once per session
+    '''
+    if rows not in __datasets:
+        __datasets[rows] = synthetic.generate(rows)
+    return __datasets[rows].copy()
+
+
+@pytest.fixture
+def title_pages():
+    '''
+    the saved title pages, name -> html, recorded with record_fixtures.py
+    '''
+    pages = {}
+    for name in sorted(os.listdir(FIXTURE_FOLDER)):
+        if name.endswith('.html'):
+            with open(os.path.join(FIXTURE_FOLDER, name), encoding='utf-8') as file:
+                pages[name] = file.read()
+    return pages
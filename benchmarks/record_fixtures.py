@@ -0,0 +1,68 @@
+'''
+Record the title pages of benchmarks/fixtures, so bench_get_data parses full IMDb pages (several hundred kB of
+markup and json) instead of the small hand-written stand-ins. Run it from the repository root with
+
+    python benchmarks/record_fixtures.py
+    python benchmarks/record_fixtures.py --archive ./page_archive
+
+The first fetches the pages from IMDb, the second takes them from a PageArchive filled by a crawl with
+spider_IMDb(archive_folder=...), which needs no network access. Every page is parsed before it is saved, and
+a page the spider cannot parse or whose title differs from the expected one is not written.
+'''
+import os
+import sys
+import argparse
+import requests
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_FOLDER, '..'))
+
+from spider_tools.spider_IMDb import spider_IMDb
+from spider_tools.page_archive import PageArchive
+
+FIXTURE_FOLDER = os.path.join(BENCHMARK_FOLDER, 'fixtures')
+# fixture name -> (title url, the title bench_get_data expects)
+FIXTURES = {
+    'title_page.html': ('https://www.imdb.com/title/tt1375666/', 'Inception'),
+    'title_page_no_boxoffice.html': ('https://www.imdb.com/title/tt0017925/', 'The General'),
+}
+
+
+def fetch(url, archive=None):
+    '''
+    the html of a title page, from the archive if one is given, return str
+    '''
+    if archive is None:
+        resp = requests.get(url, headers={'Accept-Language': 'en-US,en;q=0.9'}, timeout=30)
+        resp.raise_for_status()
+        return resp.text
+    # the archived urls are the chart's links, which can carry a query string after the title path
+    path = url[url.index('/title/'):]
+    for key in archive.keys():
+        if path in key:
+            return archive.get(key)
+    raise KeyError('%s is not in the archive' % url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--archive', default=None, help='the folder of a PageArchive to take the pages from')
+    args = parser.parse_args()
+
+    archive = PageArchive(args.archive) if args.archive is not None else None
+    try:
+        for name, (url, title) in FIXTURES.items():
+            html = fetch(url, archive)
+            parsed = spider_IMDb.__parse_data__(html)[0]
+            if parsed != title:
+                raise ValueError('%s was parsed as "%s" instead of "%s"' % (url, parsed, title))
+            with open(os.path.join(FIXTURE_FOLDER, name), 'w', encoding='utf-8', newline='') as file:
+                file.write(html)
+            print('%s: %s, %.0f kB' % (name, title, len(html.encode('utf-8')) / 1024))
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+if __name__ == '__main__':
+    main()
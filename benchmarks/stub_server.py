@@ -0,0 +1,146 @@
+'''
+Local stand-in for IMDb that throttles like a rate limited server, for the spider's adaptive crawler.
+It serves a chart page linking to `movies` title pages, answers 429 with a Retry-After header while more than
+`capacity` requests are in flight, and takes longer to answer the more requests are in flight. The title pages are
+the saved page of benchmarks/fixtures, except the ids in `broken`, which get a page the parser does not expect.
+StaticServer serves fixed files such as posters and counts the requests of every path.
+'''
+import threading
+import collections
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+UNEXPECTED_PAGE = '<html><body><h1>Please verify you are a human</h1></body></html>'
+
+
+class ThrottlingServer:
+    def __init__(self, title_page, movies=120, capacity=4, latency=0.01, retry_after='0.3', broken=(13, 113)):
+        '''
+        Parameter initialization
+        title_page: the html served for every title
+        movies: the number of titles on the chart
+        capacity: the number of requests in flight above which the server answers 429
+        latency: the time in seconds one request in flight takes, n requests in flight take n times as long
+        retry_after: the Retry-After header of the 429 responses
+        broken: the title numbers that get an unexpected page
+        '''
+        self.title_page = title_page
+        self.movies = movies
+        self.capacity = capacity
+        self.latency = latency
+        self.retry_after = retry_after
+        self.broken = set(broken)
+        self.statuses = collections.Counter()
+        self.peak = 0
+        self.__active = 0
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), self.__handler())
+        self.__server.daemon_threads = True
+        self.url = 'http://127.0.0.1:%d/' % self.__server.server_port
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith('/chart'):
+                    server.send(self, 200, ''.join('<td class="titleColumn"><a href="title/tt%07d/" title="">M</a></td>'
+                                                   % i for i in range(server.movies)))
+                    return
+                active = server.enter()
+                try:
+                    if active > server.capacity:
+                        server.send(self, 429, 'Too Many Requests', {'Retry-After': server.retry_after})
+                        return
+                    time.sleep(server.latency * active)
+                    number = int(self.path.strip('/').split('tt')[-1])
+                    server.send(self, 200, UNEXPECTED_PAGE if number in server.broken else server.title_page)
+                finally:
+                    server.leave()
+        return Handler
+
+
+    def enter(self):
+        '''
+        count a request in flight, return the number in flight with it
+        '''
+        with self.__lock:
+            self.__active += 1
+            self.peak = max(self.peak, self.__active)
+            return self.__active
+
+    def leave(self):
+        with self.__lock:
+            self.__active -= 1
+
+    def send(self, handler, status, body, headers=None):
+        with self.__lock:
+            self.statuses[status] += 1
+        data = body.encode('utf-8')
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def title_url(self, number):
+        return '%stitle/tt%07d/' % (self.url, number)
+
+    def __enter__(self):
+        threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+class StaticServer:
+    def __init__(self, files, latency=0.01):
+        '''
+        Parameter initialization
+        files: dict of path (e.g. '/poster/1.jpg') -> (content type, bytes), any other path is answered with 404
+        latency: the time in seconds every request takes
+        '''
+        self.files = files
+        self.latency = latency
+        self.requests = collections.Counter()
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), self.__handler())
+        self.__server.daemon_threads = True
+        self.url = 'http://127.0.0.1:%d' % self.__server.server_port
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.count(self.path)
+                time.sleep(server.latency)
+                content_type, data = server.files.get(self.path, ('text/plain', b'Not Found'))
+                self.send_response(200 if self.path in server.files else 404)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def count(self, path):
+        with self.__lock:
+            self.requests[path] += 1
+
+    def __enter__(self):
+        threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.__server.shutdown()
+        self.__server.server_close()
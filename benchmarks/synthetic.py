@@ -0,0 +1,102 @@
+'''
+Generator of synthetic datasets shaped like IMDb.xls, for benchmarks at sizes the top 250 cannot reach.
+The strings follow the formats of the crawled data: "October 14, 1994 (United States)" release dates,
+"2.7M" / "92K" vote counts, multi-valued countries and languages written without separator ("United StatesJapan"),
+and budgets in the currencies the exchange rate table knows, including the non-breaking space after "DEM" or "FRF".
+'''
+import numpy as np
+import pandas as pd
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+FILM_RATINGS = (['R', 'PG', 'PG-13', 'Not Rated', 'G', 'Passed', 'Approved', 'TV-PG', 'Unrated', 'X', 'TV-MA', 'GP'],
+                [101, 37, 34, 24, 19, 16, 13, 1, 1, 1, 1, 1])
+GENRES = (['Drama', 'Thriller', 'War', 'Sci-Fi', 'Romance', 'Mystery', 'Fantasy', 'Comedy', 'History', 'Family',
+           'Adventure', 'Western', 'Crime', 'Sport', 'Music', 'Film-Noir', 'Horror'],
+          [72, 29, 23, 20, 16, 16, 13, 13, 9, 9, 7, 6, 5, 5, 3, 2, 2])
+COUNTRIES = (['United States', 'United Kingdom', 'Japan', 'South Korea', 'India', 'France', 'Germany', 'Italy',
+              'New Zealand', 'West Germany', 'Brazil', 'Australia', 'Spain', 'Canada', 'Maldives'],
+             [140, 35, 14, 5, 5, 8, 6, 5, 3, 3, 2, 2, 2, 3, 1])
+LANGUAGES = (['English', 'Spanish', 'Japanese', 'French', 'German', 'Latin', 'Italian', 'Korean', 'Hindi',
+              'Mandarin', 'Russian', 'Portuguese', 'Arabic', 'Hebrew'],
+             [180, 20, 14, 15, 8, 5, 6, 5, 5, 4, 4, 2, 2, 2])
+# symbol, weight, typical budget in that currency
+CURRENCIES = [('$', 477, 3e7), ('£', 4, 2e7), ('¥', 3, 1e9), ('€', 3, 2e7), ('DEM\xa0', 2, 3e7), ('₹', 2, 5e8),
+              ('R$', 1, 5e6), ('FRF\xa0', 1, 1e8), ('MVR\xa0', 1, 1e6), ('A$', 1, 2e7), ('₩', 1, 1e10)]
+KEYWORDS = ['prison', 'escape', 'friendship', 'mafia', 'revenge', 'dream', 'time travel', 'based on novel',
+            'world war two', 'police', 'murder', 'love', 'family relationships', 'surprise ending', 'dystopia',
+            'national film registry', 'betrayal', 'heist', 'coming of age', 'superhero']
+
+
+def __choice(rng, values, rows):
+    names, weights = values
+    weights = np.asarray(weights, dtype=float)
+    return np.asarray(names, dtype=object)[rng.choice(len(names), rows, p=weights / weights.sum())]
+
+
+def __multi_valued(rng, values, rows):
+    '''
+    one to three distinct names per row, concatenated without separator like the crawled data
+    '''
+    first = __choice(rng, values, rows)
+    second = __choice(rng, values, rows)
+    third = __choice(rng, values, rows)
+    count = rng.choice([1, 2, 3], rows, p=[0.6, 0.3, 0.1])
+    result = []
+    for i in range(rows):
+        names = [first[i]]
+        if count[i] >= 2 and second[i] != first[i]:
+            names.append(second[i])
+        if count[i] >= 3 and third[i] not in names:
+            names.append(third[i])
+        result.append(''.join(names))
+    return result
+
+
+def __money(rng, rows, missing=0.02):
+    symbols = [c[0] for c in CURRENCIES]
+    weights = np.array([c[1] for c in CURRENCIES], dtype=float)
+    scales = np.array([c[2] for c in CURRENCIES])
+    currency = rng.choice(len(CURRENCIES), rows, p=weights / weights.sum())
+    amount = (scales[currency] * rng.lognormal(0, 1, rows)).astype(np.int64)
+    estimated = rng.random(rows) < 0.8
+    absent = rng.random(rows) < missing
+    result = []
+    for i in range(rows):
+        if absent[i]:
+            result.append(' ')
+        else:
+            result.append('%s%s%s' % (symbols[currency[i]], format(amount[i], ','), ' (estimated)' if estimated[i] else ''))
+    return result
+
+
+def generate(rows, seed=0):
+    '''
+    Generate a DataFrame with the columns of IMDb.xls.
+    :param rows: the number of movies
+    :param seed: the seed of the random generator, the same seed gives the same dataset
+    :return: pd.DataFrame
+    '''
+    rng = np.random.default_rng(seed)
+    year = rng.integers(1920, 2023, rows)
+    month = rng.integers(0, 12, rows)
+    day = rng.integers(1, 29, rows)
+    release_country = __choice(rng, COUNTRIES, rows)
+    votes = np.exp(rng.uniform(np.log(2.5e4), np.log(2.8e6), rows))
+    keyword_index = rng.integers(0, len(KEYWORDS), (rows, 4))
+    data = pd.DataFrame({
+        'Title': ['Movie %d' % i for i in range(rows)],
+        'Year': ['%s %d, %d (%s)' % (MONTHS[m], d, y, c) for m, d, y, c in zip(month, day, year, release_country)],
+        'Film rating': __choice(rng, FILM_RATINGS, rows),
+        'Time': rng.integers(60, 240, rows),
+        'Score': np.round(rng.uniform(8.0, 9.3, rows), 1),
+        'Rating Numbers': ['%.1fM' % (v / 1e6) if v >= 1e6 else '%dK' % (v / 1e3) for v in votes],
+        'Genre': __choice(rng, GENRES, rows),
+        'Language': __multi_valued(rng, LANGUAGES, rows),
+        'Keywords': [','.join(KEYWORDS[k] for k in row) for row in keyword_index],
+        'Budget': __money(rng, rows),
+        'Gross worldwide': __money(rng, rows),
+        'Country': __multi_valued(rng, COUNTRIES, rows),
+    })
+    # the chart is sorted by score
+    return data.sort_values('Score', ascending=False, kind='stable').reset_index(drop=True)
@@ -10,6 +10,131 @@ import re
 from collections import Counter
 from pyecharts.charts import WordCloud
 import collections
+import os
+import io
+import json
+import base64
+import requests
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+from pyecharts.globals import CurrentConfig
+import pyecharts
+
+try:
+    from spider_tools.build_cache import input_hash
+except ImportError:
+    from build_cache import input_hash
+
+# bump when the charts change, so the outputs recorded in a BuildCache are built again
+HTML_RENDERER_VERSION = 'html-1 pyecharts-%s' % pyecharts.__version__
+
+# the JavaScript files the dashboard loads, relative to its assets folder
+DASHBOARD_ASSETS = ['echarts.min.js', 'echarts-wordcloud.min.js', 'themes/chalk.js', 'themes/macarons.js']
+
+
+def vendor_assets(folder='./plot_html/assets', host=None):
+    '''
+    Download the JavaScript files of the dashboard once into a local folder, files already there are kept.
+    :param folder: the assets folder, next to the dashboard html
+    :param host: the url the files are downloaded from, the pyecharts asset host if None
+    :return: the assets folder
+    '''
+    if host is None:
+        host = CurrentConfig.ONLINE_HOST
+    for name in DASHBOARD_ASSETS:
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        resp = requests.get(host + name, timeout=30)
+        resp.raise_for_status()
+        with open(path, 'wb') as file:
+            file.write(resp.content)
+    return folder
+
+
+def _figure_png(spec):
+    '''
+    Render one matplotlib / seaborn chart of the dashboard to PNG bytes.
+    The object oriented Figure API is used instead of pyplot, so charts can be rendered in worker processes.
+    :param spec: dict with 'kind' ('pie', 'distribution' or 'regression') and the data of the chart
+    :return: bytes
+    '''
+    if spec['kind'] == 'pie':
+        fig = Figure(figsize=(6, 6), dpi=120)
+        ax = fig.add_subplot(111)
+        ax.pie(spec['values'], labels=spec['labels'], colors=["#4E79A7", "#A0CBE8", "#F28E2B"], explode=(0.2, 0, 0),
+               autopct='%.2f%%', labeldistance=1.1, pctdistance=0.9, radius=1, startangle=90, counterclock=False)
+    elif spec['kind'] == 'regression':
+        fig = Figure(figsize=(6, 5), dpi=120)
+        ax = fig.add_subplot(111)
+        sns.regplot(x=spec['x'], y=spec['y'], ax=ax)
+        ax.set_xlabel(spec['xlabel'])
+        ax.set_ylabel(spec['ylabel'])
+    else:
+        fig = Figure(figsize=(6, 5), dpi=120)
+        ax = fig.add_subplot(111)
+        sns.histplot(spec['values'], bins=30, kde=True, ax=ax)
+        ax.set_xlabel(spec['xlabel'])
+    ax.set_title(spec['title'])
+    output = io.BytesIO()
+    fig.savefig(output, format='png', bbox_inches='tight')
+    return output.getvalue()
+
+
+def render_dashboard(specs, path='./plot_html/dashboard.html', assets='assets', max_workers=None):
+    '''
+    Write one html page with every chart of the chart specs made by Data.DashboardSpecs().
+    The matplotlib charts are rendered in parallel worker processes and embedded as PNG, the pyecharts charts are
+    drawn in the browser from their options with the local JavaScript files of vendor_assets(), a FileNotFoundError
+    is raised if they are not in the assets folder.
+    :param specs: dict made by Data.DashboardSpecs(), or loaded from the json file it was saved to
+    :param path: the html file to write
+    :param assets: the assets folder, relative to the html file
+    :param max_workers: the number of worker processes, os.cpu_count() if None
+    :return: the path of the html file
+    '''
+    # without the JavaScript files the page would load, but every pyecharts chart would stay blank
+    assets_folder = os.path.join(os.path.dirname(path), assets)
+    missing = [name for name in DASHBOARD_ASSETS if not os.path.exists(os.path.join(assets_folder, name))]
+    if missing:
+        raise FileNotFoundError('the dashboard assets %s are missing from %s, download them first with '
+                                'vendor_assets(%r)' % (', '.join(missing), assets_folder, assets_folder))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        images = list(executor.map(_figure_png, specs['figures']))
+
+    blocks = []
+    for png in images:
+        blocks.append('<div class="chart"><img src="data:image/png;base64,%s"></div>' % base64.b64encode(png).decode('ascii'))
+    scripts = []
+    for i, chart in enumerate(specs['echarts']):
+        blocks.append('<div class="chart" id="echart_%d" style="width:900px;height:500px;"></div>' % i)
+        scripts.append('echarts.init(document.getElementById("echart_%d"), %s).setOption(%s);'
+                       % (i, json.dumps(chart['theme']), json.dumps(chart['option'], ensure_ascii=False).replace('</', '<\\/')))
+    html = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>IMDb top 250 movies</title>
+%s
+<style>body {font-family: sans-serif;} .chart {display: inline-block; margin: 10px; vertical-align: top;}</style>
+</head>
+<body>
+<h1>IMDb top 250 movies</h1>
+%s
+<script>
+%s
+</script>
+</body>
+</html>
+''' % ('\n'.join('<script src="%s/%s"></script>' % (assets, name) for name in DASHBOARD_ASSETS),
+       '\n'.join(blocks), '\n'.join(scripts))
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(html)
+    return path
 
 
 
@@ -21,8 +146,27 @@ class Data:
     4.Data Visualization
     '''
 
-    def __init__(self,DataName) -> None:
+    def __init__(self,DataName, build_cache=None) -> None:
+        '''
+        :param DataName: the path of IMDb.xls
+        :param build_cache: a BuildCache, the html charts are then only rendered again when their options changed
+        '''
         self.DataName = DataName
+        self.build_cache = build_cache
+
+    def __render(self, chart, path, inputs=None):
+        '''
+        Render a pyecharts chart, unless the build cache knows it was rendered from the same inputs.
+        :param inputs: what the chart is drawn from, its options if None (the word cloud options are not usable,
+                       pyecharts gives every word a random color)
+        '''
+        if self.build_cache is not None:
+            digest = input_hash(HTML_RENDERER_VERSION, chart.dump_options() if inputs is None else inputs)
+            if self.build_cache.is_fresh(path, digest):
+                return
+        chart.render(path)
+        if self.build_cache is not None:
+            self.build_cache.record(path, digest)
 
     def Import(self):
         '''
@@ -177,6 +321,45 @@ class Data:
         sns.displot(Year_era, bins=30, kde=True)
 
         # Pie chart
+        Y_pie = self.__year_pie(era, era_number)
+        Y_pie.load_javascript()
+        #Y_pie.render_notebook()
+        self.__render(Y_pie, './plot_html/Year_of_movie.html')
+
+        word_counts = self.__genre_counts(data)
+        # Word frequency statistics: Get the top 100 most frequent words
+        wc = self.__word_cloud(word_counts)
+        wc.load_javascript()
+        #wc.render_notebook()
+        self.__render(wc, './plot_html/Word_frequency.html', word_counts.most_common(100))
+
+        # Use pie chart to analyze the proportion of various types of movies
+        a3 = self.__genre_pie(word_counts)
+        a3.load_javascript()
+        #a3.render_notebook()
+        self.__render(a3, './plot_html/Proportion_of_films.html')
+
+        # Analyze the distribution of movie lengths
+        sns.displot(data['Time'], bins=30, kde=True)
+
+        # Analyze the relationship between film length and score
+        length_score = self.__length_score(data)
+        plt.figure(figsize=(6, 5), dpi=120)
+        sns.regplot(x=length_score['Time'], y=length_score['Score'])
+        plt.title('Film length and score')
+        plt.show()
+
+    @staticmethod
+    def __length_score(data):
+        '''
+        The length and score of the movies that have both, as numbers.
+        '''
+        length_score = pd.DataFrame({'Time': pd.to_numeric(data['Time'], errors='coerce'),
+                                     'Score': pd.to_numeric(data['Score'], errors='coerce')})
+        return length_score.dropna().astype(float)
+
+    @staticmethod
+    def __year_pie(era, era_number):
         Y_pie = Pie(init_opts=opts.InitOpts(theme=ThemeType.CHALK))
         Y_pie.add(series_name='Year',
                   data_pair=[list(z) for z in zip(era, era_number)],
@@ -187,27 +370,26 @@ class Data:
                                                         pos_left='center',
                                                         pos_top=30))
         Y_pie.set_series_opts(tooltip_opts=opts.TooltipOpts(trigger='item', formatter='{a} <br/>{b}:{c} ({d}%)'))
-        Y_pie.load_javascript()
-        #Y_pie.render_notebook()
-        Y_pie.render('./plot_html/Year_of_movie.html')
+        return Y_pie
 
+    @staticmethod
+    def __genre_counts(data):
         result_list = []
         for i in data['Genre'].values:
             word_list = str(i).split(' / ')
             for j in word_list:
                 result_list.append(j)
-        result_list
-        word_counts = collections.Counter(result_list)
+        return collections.Counter(result_list)
+
+    @staticmethod
+    def __word_cloud(word_counts):
         # Word frequency statistics: Get the top 100 most frequent words
-        word_counts_top = word_counts.most_common(100)
-        #print(word_counts_top)
         wc = WordCloud()
-        wc.add('', word_counts_top)
-        wc.load_javascript()
-        #wc.render_notebook()
-        wc.render('./plot_html/Word_frequency.html')
+        wc.add('', word_counts.most_common(100))
+        return wc
 
-        # Use pie chart to analyze the proportion of various types of movies
+    @staticmethod
+    def __genre_pie(word_counts):
         word_counts_top = word_counts.most_common(10)
         a3 = Pie(init_opts=opts.InitOpts(theme=ThemeType.MACARONS))
         a3.add(series_name='Genre',
@@ -219,10 +401,60 @@ class Data:
                                                      pos_left='center',
                                                      pos_top=50))
         a3.set_series_opts(tooltip_opts=opts.TooltipOpts(trigger='item', formatter='{a} <br/>{b}:{c} ({d}%)'))
-        a3.load_javascript()
-        #a3.render_notebook()
-        a3.render('./plot_html/Proportion_of_films.html')
+        return a3
 
-        # Analyze the distribution of movie lengths
-        sns.displot(data['Time'], bins=30, kde=True)
+    def DashboardSpecs(self, data, Statistics_data):
+        '''
+        :param data: cleaned_data
+        :param Statistics_data: the data after use Statistics()
+        :return: the json serializable specs of every chart of Visualization(): the data of the matplotlib charts
+                 and the options of the pyecharts charts
+        '''
+        CountryNum, CountryName, Year_era, era, era_number = Statistics_data
+        word_counts = self.__genre_counts(data)
+        length_score = self.__length_score(data)
+        figures = [
 
+            {'kind': 'pie', 'title': 'Distribution of Country origin',
+             'values': [int(i) for i in CountryNum], 'labels': list(CountryName)},
+            {'kind': 'distribution', 'title': 'Year of movies (by era)', 'xlabel': 'Year',
+             'values': [int(i) for i in Year_era]},
+            {'kind': 'distribution', 'title': 'Distribution of movie lengths', 'xlabel': 'Time',
+             'values': pd.to_numeric(data['Time'], errors='coerce').dropna().astype(float).tolist()},
+            {'kind': 'regression', 'title': 'Film length and score', 'xlabel': 'Time', 'ylabel': 'Score',
+             'x': length_score['Time'].tolist(), 'y': length_score['Score'].tolist()},
+        ]
+        charts = [(self.__year_pie([int(i) for i in era], [int(i) for i in era_number]), 'chalk'),
+                  (self.__word_cloud(word_counts), None),
+                  (self.__genre_pie(word_counts), 'macarons')]
+        echarts = [{'theme': theme, 'option': json.loads(chart.dump_options())} for chart, theme in charts]
+        return {'figures': figures, 'echarts': echarts}
+
+    def Dashboard(self, data, Statistics_data, path='./plot_html/dashboard.html', json_only=False, max_workers=None):
+        '''
+        :param data: cleaned_data
+        :param Statistics_data: the data after use Statistics()
+        :param path: the html file to write
+        :param json_only: only save the chart specs as json (next to path, with the .json suffix) so the page can be
+                          rendered again later with render_dashboard(json.load(file)) without the data
+        :param max_workers: the number of worker processes rendering the matplotlib charts
+        :return: one html page with every chart of Visualization(), which loads the JavaScript files from the local
+                 assets folder (see vendor_assets()) instead of a CDN, or the json file of the chart specs
+        '''
+        specs = self.DashboardSpecs(data, Statistics_data)
+        if json_only:
+            json_path = os.path.splitext(path)[0] + '.json'
+            with open(json_path, 'w', encoding='utf-8') as file:
+                json.dump(specs, file, ensure_ascii=False)
+            return json_path
+        if self.build_cache is not None:
+            # the word cloud options have random colors, its word counts are hashed instead
+            era, era_number = Statistics_data[3], Statistics_data[4]
+            digest = input_hash(HTML_RENDERER_VERSION, specs['figures'], list(era), list(era_number),
+                                self.__genre_counts(data).most_common(100))
+            if self.build_cache.is_fresh(path, digest):
+                return path
+        render_dashboard(specs, path, max_workers=max_workers)
+        if self.build_cache is not None:
+            self.build_cache.record(path, digest)
+        return path
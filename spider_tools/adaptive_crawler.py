@@ -0,0 +1,265 @@
+import time
+import threading
+import datetime
+from collections import deque
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+# the statuses a server answers with when it is overloaded or rate limits the client
+THROTTLE_STATUSES = (429, 503)
+
+
+def retry_after_seconds(value, now=None):
+    '''
+    Get the number of seconds to wait from a Retry-After header, which is either a number of seconds or an http date,
+    return float, or None if the header is missing or cannot be read
+    value: the header's value
+    now: the current time as an aware datetime, datetime.now(timezone.utc) if None
+    '''
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (date - now).total_seconds())
+
+
+class AimdController:
+    def __init__(self, initial_concurrency=2, min_concurrency=1, max_concurrency=16, increase=1.0, decrease=0.5,
+                 latency_target=None, latency_tolerance=3.0, min_latency_target=0.1, max_retry_after=60.0,
+                 goodput_window=10.0):
+        '''
+        Parameter initialization
+        The number of requests in flight is tuned like TCP congestion control: it grows by `increase` for every
+        round of fast successful responses, and is multiplied by `decrease` when the server throttles (429 / 503),
+        a request fails to connect, or the latency goes above the target. Only one decrease is made per round, a
+        response to a request started before the last decrease does not decrease again. A client error (4xx other
+        than 429, e.g. a 404 of a removed page) says nothing about the load of the server and leaves it unchanged.
+        A Retry-After header pauses all new requests until it has passed.
+        self.min_concurrency and self.max_concurrency bound the number of requests in flight
+        self.latency_target is the latency in seconds above which the server is taken as overloaded,
+        latency_tolerance times the lowest latency seen so far (but at least min_latency_target) if None
+        self.max_retry_after is the longest pause in seconds a Retry-After header can ask for
+        self.goodput_window is the time in seconds goodput() is measured over
+        '''
+        if not 1 <= min_concurrency <= initial_concurrency <= max_concurrency:
+            raise ValueError('concurrency must satisfy 1 <= min_concurrency <= initial_concurrency <= max_concurrency')
+        if not 0 < decrease < 1:
+            raise ValueError('decrease must be between 0 and 1')
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.latency_tolerance = latency_tolerance
+        self.min_latency_target = min_latency_target
+        self.max_retry_after = max_retry_after
+        self.goodput_window = goodput_window
+        self.__window = float(initial_concurrency)
+        self.__condition = threading.Condition()
+        self.__in_flight = 0
+        self.__paused_until = 0.0
+        self.__last_decrease = 0.0
+        self.__lowest_latency = None
+        self.__successes = deque()      # completion time of the recent successful requests
+        self.history = []               # (time, concurrency) after every change
+        self.counts = {'success': 0, 'throttled': 0, 'slow': 0, 'failed': 0, 'client_error': 0}
+
+    @property
+    def concurrency(self):
+        '''
+        the number of requests allowed in flight at once
+        '''
+        return int(self.__window)
+
+    @property
+    def in_flight(self):
+        '''
+        the number of requests in flight
+        '''
+        return self.__in_flight
+
+    def acquire(self):
+        '''
+        Wait until a request may start, return the start time to give to release()
+        '''
+        with self.__condition:
+            while True:
+                now = time.monotonic()
+                if now < self.__paused_until:
+                    self.__condition.wait(self.__paused_until - now)
+                elif self.__in_flight >= self.concurrency:
+                    self.__condition.wait()
+                else:
+                    self.__in_flight += 1
+                    return now
+
+    def release(self, start, status=None, retry_after=None, success=True):
+        '''
+        Report the outcome of a request started by acquire(), and tune the concurrency
+        start: the start time acquire() returned
+        status: the http status, None if no response was received
+        retry_after: the value of the Retry-After header
+        success: False if the page was received but could not be used, it is then left out of the goodput
+        '''
+        now = time.monotonic()
+        latency = now - start
+        with self.__condition:
+            self.__in_flight -= 1
+            if status is None:
+                self.counts['failed'] += 1
+                self.__decrease(start, now)
+            elif status in THROTTLE_STATUSES:
+                self.counts['throttled'] += 1
+                self.__decrease(start, now)
+                pause = retry_after_seconds(retry_after)
+                if pause is not None:
+                    self.__paused_until = max(self.__paused_until, now + min(pause, self.max_retry_after))
+            elif 400 <= status < 500:
+                # neither a success nor a sign of overload, and its latency is not the one of a page
+                self.counts['client_error'] += 1
+            else:
+                if self.__lowest_latency is None or latency < self.__lowest_latency:
+                    self.__lowest_latency = latency
+                target = self.latency_target
+                if target is None:
+                    target = max(self.__lowest_latency * self.latency_tolerance, self.min_latency_target)
+                if latency > target:
+                    self.counts['slow'] += 1
+                    self.__decrease(start, now)
+                else:
+                    # one increase per round: every response of a full window adds increase / window
+                    self.__window = min(float(self.max_concurrency), self.__window + self.increase / self.__window)
+                    self.__record()
+                if success and status < 400:
+                    self.counts['success'] += 1
+                    self.__successes.append(now)
+            self.__condition.notify_all()
+
+    def __decrease(self, start, now):
+        if start < self.__last_decrease:
+            return
+        self.__window = max(float(self.min_concurrency), self.__window * self.decrease)
+        self.__last_decrease = now
+        self.__record()
+
+    def __record(self):
+        if not self.history or self.history[-1][1] != self.concurrency:
+            self.history.append((time.monotonic(), self.concurrency))
+
+    def goodput(self):
+        '''
+        the number of successful requests per second over the last goodput_window seconds, return float
+        '''
+        with self.__condition:
+            now = time.monotonic()
+            while self.__successes and self.__successes[0] < now - self.goodput_window:
+                self.__successes.popleft()
+            return len(self.__successes) / self.goodput_window
+
+    def stats(self):
+        '''
+        the current state of the controller, return Dict
+        '''
+        stats = dict(self.counts)
+        stats.update(concurrency=self.concurrency, in_flight=self.in_flight, goodput=self.goodput())
+        return stats
+
+
+class AdaptiveCrawler:
+    def __init__(self, parser, controller=None, session=None, max_attempts=4, backoff=1.0, timeout=30):
+        '''
+        Parameter initialization
+        Fetch pages with the number of requests in flight tuned by an AimdController
+        self.parser is called with (url, html) for every page and returns what crawl() keeps for the url
+        self.controller is the AimdController, one with the default settings if None
+        self.session is the requests.Session used for all requests
+        self.max_attempts is how many times a url is requested when it is throttled or the request fails
+        self.backoff is the wait in seconds before the second attempt without Retry-After, doubled at every attempt
+        self.timeout is the timeout of one request in seconds
+        self.dead_letters is the list of (url, error, html) of the pages the parser failed on, so they can be looked
+        at or parsed again later
+        self.errors is the url -> error of the pages that could not be fetched
+        '''
+        self.parser = parser
+        self.controller = controller if controller is not None else AimdController()
+        self.session = session if session is not None else requests.Session()
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.dead_letters = []
+        self.errors = {}
+        self.__lock = threading.Lock()
+
+    def __fetch(self, url):
+        for attempt in range(self.max_attempts):
+            start = self.controller.acquire()
+            status, retry_after, success = None, None, False
+            # the slot is given back whatever happens to the request, so a failure never shrinks the pool
+            try:
+                try:
+                    resp = self.session.get(url, timeout=self.timeout)
+                except requests.RequestException as error:
+                    last_error = error
+                else:
+                    status = resp.status_code
+                    if status in THROTTLE_STATUSES:
+                        retry_after = resp.headers.get('Retry-After')
+                        last_error = requests.HTTPError('%d %s' % (status, resp.reason), response=resp)
+                    elif status >= 400:
+                        raise requests.HTTPError('%d %s' % (status, resp.reason), response=resp)
+                    else:
+                        try:
+                            result = self.parser(url, resp.text)
+                        except Exception as error:
+                            # an unexpected page (e.g. an IndexError from findall(...)[0]) or a failure while keeping
+                            # it (e.g. an OSError of the archive) loses this page only
+                            with self.__lock:
+                                self.dead_letters.append((url, error, resp.text))
+                            return None
+                        success = True
+                        return result
+            finally:
+                self.controller.release(start, status, retry_after, success)
+            if status in THROTTLE_STATUSES and retry_after_seconds(retry_after) is not None:
+                # the controller pauses every request until Retry-After has passed
+                continue
+            if attempt < self.max_attempts - 1:
+                time.sleep(self.backoff * 2 ** attempt)
+        raise last_error
+
+    def crawl(self, urls):
+        '''
+        callable function
+        fetch and parse every url, at most controller.max_concurrency at once
+        throttled and failed requests are tried again up to max_attempts times, pages that fail to parse are put into
+        self.dead_letters and pages that cannot be fetched into self.errors, neither stops the crawl
+        urls: list of the pages' url
+        return Dict, url -> parser result, for the urls that were fetched and parsed
+        '''
+        self.dead_letters = []
+        self.errors = {}
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.controller.max_concurrency) as executor:
+            futures = {url: executor.submit(self.__fetch, url) for url in dict.fromkeys(urls)}
+            for url, future in futures.items():
+                try:
+                    result = future.result()
+                except Exception as error:
+                    self.errors[url] = error
+                    continue
+                if result is not None:
+
+                    results[url] = result
+        return results
@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+
+
+def input_hash(*parts):
+    """
+    Content hash of the inputs of an output. The parts are serialized to canonical json, so dictionaries and
+    lists that compare equal give the same hash.
+    :param parts: json serializable values (numpy / pandas values are converted with str)
+    :return: str, sha256 hex digest
+    """
+    text = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class BuildCache:
+    def __init__(self, path='./build_cache.json'):
+        """
+        Records the input hash every chart and report was last built from, so after a re-crawl only the outputs
+        whose inputs (the dataset rows they show, the exchange rates, the renderer version) changed are built again.
+        The hashes are saved once at the end of a build, by save() or when a with block of the cache ends.
+        :param path: the json file the hashes are saved to
+        """
+        self.path = path
+        self.hashes = {}            # output path -> input hash
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                self.hashes = json.load(file)
+        self.built = []
+        self.skipped = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # the outputs built before an error are complete, so they are recorded as well
+        if self.built:
+            self.save()
+
+    def is_fresh(self, output_path, digest):
+        """
+        Whether the output exists and was built from the same inputs. The output is counted as skipped if so,
+        unless it was built since the cache was opened: every output is counted once, however often it is checked.
+        :param output_path: the path of the output file
+        :param digest: the input hash of the output, see input_hash()
+        :return: bool
+        """
+        key = os.path.normpath(output_path)
+        if self.hashes.get(key) == digest and os.path.exists(output_path):
+            if key not in self.built and key not in self.skipped:
+                self.skipped.append(key)
+            return True
+        return False
+
+    def record(self, output_path, digest):
+        """
+        Remember the input hash of an output that has just been built, see save().
+        :param output_path: the path of the output file
+        :param digest: the input hash of the output
+        :return:
+        """
+        key = os.path.normpath(output_path)
+        self.hashes[key] = digest
+        if key in self.skipped:
+            self.skipped.remove(key)
+        if key not in self.built:
+            self.built.append(key)
+
+    def save(self):
+        """
+        Write the hashes to the json file.
+        """
+
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(self.hashes, file, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+    def summary(self):
+        """
+        What was built and what was skipped since the cache was opened.
+        :return: str
+        """
+        lines = ['%d output(s) built, %d skipped because their inputs did not change.'
+                 % (len(self.built), len(self.skipped))]
+        lines += ['  built:   %s' % path for path in self.built]
+        lines += ['  skipped: %s' % path for path in self.skipped]
+        return '\n'.join(lines)
@@ -0,0 +1,146 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+# exchange rate of every currency symbol found in the Budget and Gross worldwide columns to US dollar
+CURRENCY_EXCHANGE_RATE = {'R$': 0.18482475, '₩': 0.0007474863, '€': 1.0424475, '¥': 0.13893056, '$': 1,
+                          'DEM': 0.53307053, 'MVR': 0.065187916, 'FRF': 0.15893336, '₹': 0.012246969,
+                          '£': 1.2083902, 'A$': 0.67059245}
+
+# the bundled tables of historical exchange rates by currency and year, and of the US consumer price index
+EXCHANGE_RATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exchange_rates.csv')
+CPI_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'us_cpi.csv')
+
+# the currencies without exchange rate that have been reported, each is reported once per process
+_warned_currencies = set()
+
+
+def split_money(money):
+    """
+    Split a column of amounts such as "$25,000,000 (estimated)" or "€1,200,000" into currency symbol and amount.
+    :param money: pd.Series of str
+    :return: pd.DataFrame with the columns 'currency' (str) and 'amount' (float, NaN if there is no amount)
+    """
+    money = money.astype(str).str.replace(r',| |\(estimated\)|\xa0', '', regex=True)
+    parts = money.str.extract(r'^(.*?)(\d+\.?\d*)')
+    return pd.DataFrame({'currency': parts[0], 'amount': pd.to_numeric(parts[1], errors='coerce')},
+                        index=money.index)
+
+
+def warn_unknown_currencies(currencies):
+    """
+    Warn about the currencies without exchange rate that have not been reported yet.
+    :param currencies: iterable of currency symbols
+    :return:
+    """
+    new = sorted(set(currencies) - _warned_currencies)
+    if new:
+        _warned_currencies.update(new)
+        warnings.warn('No exchange rate for the currencies %s, their amounts are NaN' % new)
+
+
+def to_dollar(money, currency_exchange_rate=None):
+    """
+    Convert a column of amounts to US dollars in one vectorized step.
+    :param money: pd.Series of str
+    :param currency_exchange_rate: dict of currency symbol -> rate, CURRENCY_EXCHANGE_RATE if None
+    :return: pd.Series of float, 0 for missing amounts and unknown currencies
+    """
+    if currency_exchange_rate is None:
+        currency_exchange_rate = CURRENCY_EXCHANGE_RATE
+    parts = split_money(money)
+    rate = parts['currency'].map(currency_exchange_rate)
+    return (parts['amount'] * rate).fillna(0)
+
+
+def release_year(dates):
+    """
+    The release year of a column of dates such as "October 14, 1994 (United States)".
+    :param dates: pd.Series of str
+    :return: pd.Series of int, 0 when there is no year
+    """
+    year = dates.astype(str).str.extract(r'(\d{4})')[0]
+    return pd.to_numeric(year, errors='coerce').fillna(0).astype(np.int32)
+
+
+def load_exchange_rates(path=EXCHANGE_RATE_FILE):
+    """
+    Load a table of exchange rates by currency and year, like the bundled exchange_rates.csv.
+    :param path: a csv file with the columns currency (the symbol as written on IMDb), year and rate (US dollars per
+                 unit), lines starting with # are comments
+    :return: pd.DataFrame with the columns currency, year and rate, sorted by year
+    """
+    rates = pd.read_csv(path, comment='#', dtype={'currency': str, 'year': np.int64, 'rate': np.float64})
+    return rates[['currency', 'year', 'rate']].sort_values(['year', 'currency'], kind='stable').reset_index(drop=True)
+
+
+def load_cpi(path=CPI_FILE):
+    """
+    Load the US consumer price index by year, like the bundled us_cpi.csv.
+    :return: pd.Series of the index, by year
+    """
+    cpi = pd.read_csv(path, comment='#', dtype={'year': np.int32, 'cpi': np.float64})
+    return cpi.set_index('year')['cpi'].sort_index()
+
+
+def unknown_currencies(money, exchange_rates=None):
+    """
+    The currencies of a column of amounts that have no exchange rate.
+    :param money: pd.Series of str
+    :param exchange_rates: the result of load_exchange_rates(), the bundled table if None
+    :return: pd.Series, the number of amounts per unknown currency symbol
+    """
+    if exchange_rates is None:
+        exchange_rates = load_exchange_rates()
+    parts = split_money(money).dropna(subset=['amount'])
+    return parts.loc[~parts['currency'].isin(exchange_rates['currency']), 'currency'].value_counts()
+
+
+def to_dollar_by_year(money, years, exchange_rates=None, cpi=None, base_year=None):
+    """
+    Convert a column of amounts to US dollars at the exchange rate of their release year, in one vectorized as-of
+    join: the distinct (currency, year) pairs are matched with pd.merge_asof against the latest rate of the currency
+    at or before the year (the first rate of the currency for years before it), then mapped back to every row.
+    With a consumer price index, the dollars are also adjusted for inflation to the dollars of base_year.
+    :param money: pd.Series of str
+    :param years: pd.Series of int aligned with money, see release_year(), 0 for an unknown year uses the latest rate
+    :param exchange_rates: the result of load_exchange_rates(), the bundled table if None
+    :param cpi: the result of load_cpi() to adjust for inflation, no adjustment if None
+    :param base_year: the year of the dollars after the inflation adjustment, the last year of cpi if None
+    :return: pd.Series of float, 0 for missing amounts and NaN for currencies without exchange rate, which are
+             reported with a warning once per currency
+
+    """
+    if exchange_rates is None:
+        exchange_rates = load_exchange_rates()
+    parts = split_money(money)
+    years = pd.Series(np.asarray(years, dtype=np.int64), index=parts.index)
+    latest_year = int(exchange_rates['year'].max())
+    rows = pd.DataFrame({'currency': parts['currency'].fillna(''), 'year': years.where(years > 0, latest_year)})
+
+    # only the distinct pairs are joined, so the join does not grow with the number of rows
+    codes, pairs = pd.MultiIndex.from_frame(rows).factorize()
+    pairs = pairs.to_frame(index=False, name=['currency', 'year'])
+    pairs['pair'] = np.arange(len(pairs))
+    pairs = pairs.sort_values('year', kind='stable')
+    backward = pd.merge_asof(pairs, exchange_rates, on='year', by='currency', direction='backward')
+    forward = pd.merge_asof(pairs, exchange_rates, on='year', by='currency', direction='forward')
+    rate = backward['rate'].fillna(forward['rate']).to_numpy()[np.argsort(backward['pair'].to_numpy())]
+
+    dollar = parts['amount'].to_numpy() * rate[codes]
+    if cpi is not None:
+        if base_year is None:
+            base_year = int(cpi.index[-1])
+        cpi_years = cpi.index.to_numpy()
+        position = np.clip(np.searchsorted(cpi_years, rows['year'].to_numpy(), side='right') - 1, 0, len(cpi) - 1)
+        base = cpi.iloc[int(np.clip(np.searchsorted(cpi_years, base_year, side='right') - 1, 0, len(cpi) - 1))]
+        dollar = dollar * (base / cpi.to_numpy()[position])
+    dollar = pd.Series(dollar, index=parts.index)
+
+    unknown = parts['amount'].notna() & np.isnan(rate[codes])
+    if unknown.any():
+        warn_unknown_currencies(parts.loc[unknown, 'currency'])
+
+    # missing amounts stay 0 like in to_dollar()
+    return dollar.where(parts['amount'].notna(), 0)
@@ -0,0 +1,262 @@
+import re
+import array
+import numpy as np
+import pandas as pd
+
+try:
+    from pyroaring import BitMap
+except ImportError:
+    BitMap = None
+
+try:
+    from spider_tools.shared_dataset import normalize
+except ImportError:
+    from shared_dataset import normalize
+
+# the facets indexed with one bitmap per value, Country and Language hold several names per movie
+FACETS = ('Genre', 'Country', 'Language', 'Film rating', 'Era')
+MULTI_VALUED_FACETS = ('Country', 'Language')
+# the numeric columns of normalize() answering range predicates
+RANGE_COLUMNS = ('Year', 'Time', 'Score', 'Votes', 'Budget', 'Gross worldwide')
+
+# a new name starts at a capital letter that does not follow a space: "United StatesJapan" -> United States, Japan
+__NAME_BOUNDARY = re.compile(r'(?<=\S)(?=[A-ZÀ-ÖØ-Þ])')
+# the number of set bits of every byte value, a popcount that does not need NumPy 2
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def split_names(value):
+    """
+    Split the multi-valued Country and Language cells of IMDb.xls, which are written without separator, into names.
+    :param value: str, e.g. "United StatesJapan"
+    :return: list of str, e.g. ['United States', 'Japan']
+    """
+    return [name for name in __NAME_BOUNDARY.split(str(value).strip()) if name]
+
+
+def _popcount(words):
+    """
+    The number of set bits of every 64 bit word.
+    :param words: np.ndarray of np.uint64
+    :return: np.ndarray of np.int64
+    """
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    return _BYTE_BITS[words.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+def era(year):
+    """
+    The decade of a release year, e.g. "1990s" (an empty string for unknown years).
+    """
+    return '%ds' % (year // 10 * 10) if year > 0 else ''
+
+
+class NumpyBitmap:
+    __slots__ = ('words', 'size')
+
+    def __init__(self, words, size):
+        """
+        An uncompressed bitmap of a fixed number of rows in 64 bit words, used when pyroaring is not installed.
+        It has the operators of pyroaring.BitMap the facet index needs.
+        """
+        self.words = words
+        self.size = size
+
+    @classmethod
+    def from_rows(cls, rows, size):
+        bits = np.zeros((size + 63) // 64 * 64, dtype=bool)
+        bits[rows] = True
+        return cls(np.packbits(bits, bitorder='little').view(np.uint64), size)
+
+    def __and__(self, other):
+        return NumpyBitmap(self.words & other.words, self.size)
+
+    def __or__(self, other):
+        return NumpyBitmap(self.words | other.words, self.size)
+
+    def __sub__(self, other):
+        return NumpyBitmap(self.words & ~other.words, self.size)
+
+    def __len__(self):
+        return int(_popcount(self.words).sum())
+
+    def intersection_cardinality(self, other):
+        return int(_popcount(self.words & other.words).sum())
+
+    def to_array(self):
+        # the lowest set bit of every non-zero word is taken off until no word has bits left
+        words = np.flatnonzero(self.words)
+        remaining = self.words[words]
+        rows = []
+        while len(words):
+            lowest = remaining & (~remaining + np.uint64(1))
+            rows.append(words * 64 + _popcount(lowest - np.uint64(1)))
+            remaining = remaining ^ lowest
+
+            left = remaining != 0
+            words, remaining = words[left], remaining[left]
+        return np.sort(np.concatenate(rows)) if rows else np.zeros(0, dtype=np.int64)
+
+
+class FacetIndex:
+    def __init__(self, data, currency_exchange_rate=None, bins=64, backend=None):
+        """
+        Faceted filtering over the movie dataset. Every value of Genre, Country, Language, Film rating and Era (the
+        release decade) gets a bitmap of the rows having it, and every numeric column is kept sorted for range
+        predicates, with cumulative bitmaps at the bin boundaries so a range only needs the rows of its two edge bins.
+        Facet and range bitmaps combine with & (and), | (or) and - (and not).
+        :param data: pd.DataFrame read from IMDb.xls
+        :param currency_exchange_rate: dict of currency symbol -> rate for Budget and Gross worldwide, see normalize()
+        :param bins: the number of cumulative bitmaps per numeric column
+        :param backend: 'roaring' (compressed bitmaps, needs pyroaring) or 'numpy', roaring when it is installed if None
+        """
+        if backend is None:
+            backend = 'roaring' if BitMap is not None else 'numpy'
+        if backend == 'roaring' and BitMap is None:
+            raise ImportError('pyroaring is required for the roaring backend, please pip install pyroaring')
+        if backend not in ('roaring', 'numpy'):
+            raise ValueError("backend must be 'roaring' or 'numpy'")
+        self.backend = backend
+        self.data = normalize(data, currency_exchange_rate)
+        self.data['Era'] = self.data['Year'].map(era)
+        self.size = len(self.data)
+        self.universe = self.__bitmap(np.arange(self.size))
+
+        self.facets = {}
+        for facet in FACETS:
+            self.facets[facet] = self.__facet_bitmaps(self.data[facet], facet in MULTI_VALUED_FACETS)
+
+        self.bin_size = max(1, -(-self.size // bins))
+        self.__ranges = {}
+        for column in RANGE_COLUMNS:
+            values = self.data[column].to_numpy()
+            order = np.argsort(values, kind='stable')
+            cumulative = [self.universe - self.universe]
+            for start in range(0, self.size - self.bin_size + 1, self.bin_size):
+                cumulative.append(cumulative[-1] | self.__bitmap(np.sort(order[start:start + self.bin_size])))
+            self.__ranges[column] = (values[order], order, cumulative, values)
+
+    def __bitmap(self, rows):
+        if self.backend == 'roaring':
+            # an array.array is read by pyroaring as one buffer instead of element by element
+            return BitMap(array.array('I', np.asarray(rows, dtype=np.uint32).tobytes()))
+        return NumpyBitmap.from_rows(rows, self.size)
+
+    def __facet_bitmaps(self, column, multi_valued):
+        """
+        One bitmap per value of a column. The distinct cells are split once, then the rows of every cell are sliced
+        from one sort of the cell codes.
+        """
+        codes, cells = pd.factorize(column, sort=True)
+        order = np.argsort(codes, kind='stable')
+        ends = np.cumsum(np.bincount(codes[codes >= 0], minlength=len(cells)))
+        starts = ends - np.bincount(codes[codes >= 0], minlength=len(cells))
+        offset = int((codes < 0).sum())
+        rows_per_name = {}
+        for i, cell in enumerate(cells):
+            names = split_names(cell) if multi_valued else [str(cell).strip()]
+            for name in names:
+                if name:
+                    rows_per_name.setdefault(name, []).append(order[offset + starts[i]:offset + ends[i]])
+        return {name: self.__bitmap(np.sort(np.concatenate(rows))) for name, rows in rows_per_name.items()}
+
+    def values(self, facet):
+        """
+        The values of a facet, e.g. the genres.
+        :return: list of str
+        """
+        return sorted(self.facets[facet])
+
+    def facet(self, facet, *values):
+        """
+        The rows having any of the values of a facet, e.g. facet('Language', 'English', 'French').
+        Unknown values match no row.
+        """
+        bitmaps = self.facets[facet]
+        result = self.universe - self.universe
+        for value in values:
+            if value in bitmaps:
+                result = result | bitmaps[value]
+        return result
+
+    def exclude(self, bitmap):
+        """
+        The rows not in the bitmap, e.g. exclude(facet('Language', 'English')) for the movies without English.
+        """
+        return self.universe - bitmap
+
+    def range(self, column, low=None, high=None):
+        """
+        The rows with low <= value < high in a numeric column, None leaves that side open. Budget and Gross worldwide
+        are in US dollars and are 0 when they are missing, use low=1 to leave those rows out.
+        """
+        values, order, cumulative, _ = self.__ranges[column]
+        start = 0 if low is None else int(np.searchsorted(values, low, side='left'))
+        end = self.size if high is None else int(np.searchsorted(values, high, side='left'))
+        # the bins fully inside the range come from the cumulative bitmaps, the rows of the edge bins from the order
+        first_bin = -(-start // self.bin_size)
+        last_bin = end // self.bin_size
+        if first_bin >= last_bin:
+            return self.__bitmap(np.sort(order[start:end]))
+        edges = np.concatenate((order[start:first_bin * self.bin_size], order[last_bin * self.bin_size:end]))
+        return (cumulative[last_bin] - cumulative[first_bin]) | self.__bitmap(np.sort(edges))
+
+    def query(self, filters=None, ranges=None, exclude=None):
+        """
+        Faceted search: the values of one facet are combined with or, everything else with and.
+        e.g. the 1990s non-English dramas rated R with score >= 8.5 and budget under $10M:
+            query({'Genre': 'Drama', 'Era': '1990s', 'Film rating': 'R'}, {'Score': (8.5, None), 'Budget': (1, 1e7)},
+                  exclude={'Language': 'English'})
+        :param filters: dict of facet -> value or list of values
+        :param ranges: dict of numeric column -> (low, high), see range()
+        :param exclude: dict of facet -> value or list of values the rows must not have
+        :return: the bitmap of the matching rows
+        """
+        # the smallest bitmaps are intersected first
+        bitmaps = sorted((self.facet(facet, *self.__as_list(values)) for facet, values in (filters or {}).items()), key=len)
+        result = self.universe
+        for bitmap in bitmaps:
+            result = result & bitmap
+        for facet, values in (exclude or {}).items():
+            result = result - self.facet(facet, *self.__as_list(values))
+        for column, (low, high) in (ranges or {}).items():
+            if len(result) <= self.bin_size:
+                # few rows left, their values are checked directly instead of building the range bitmap
+                rows = np.asarray(result.to_array(), dtype=np.int64)
+                values = self.__ranges[column][3][rows]
+                keep = np.ones(len(rows), dtype=bool)
+                if low is not None:
+                    keep &= values >= low
+                if high is not None:
+                    keep &= values < high
+                result = self.__bitmap(rows[keep])
+            else:
+                result = result & self.range(column, low, high)
+        return result
+
+    @staticmethod
+    def __as_list(values):
+        return [values] if isinstance(values, str) else list(values)
+
+    def facet_counts(self, bitmap, facets=FACETS):
+        """
+        The number of matching rows per value of every facet, for the counts next to each value of a facet list.
+        Values without matching rows are left out.
+        :return: dict of facet -> dict of value -> count, the values sorted by decreasing count
+        """
+        counts = {}
+        for facet in facets:
+            facet_counts = {}
+            for value, value_bitmap in self.facets[facet].items():
+                count = bitmap.intersection_cardinality(value_bitmap)
+                if count:
+                    facet_counts[value] = count
+            counts[facet] = dict(sorted(facet_counts.items(), key=lambda item: (-item[1], item[0])))
+        return counts
+
+    def rows(self, bitmap):
+        """
+        The matching rows of the normalized data, in chart order.
+        :return: pd.DataFrame
+        """
+        return self.data.iloc[np.asarray(bitmap.to_array(), dtype=np.int64)]
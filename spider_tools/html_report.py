@@ -0,0 +1,243 @@
+import os
+import re
+from jinja2 import Environment
+from markupsafe import Markup
+
+# the assets shared by every page, written once into the report folder
+REPORT_CSS = '''body { font-family: Helvetica, Arial, sans-serif; margin: 2em auto; max-width: 960px; color: #222; }
+h1 { font-size: 1.4em; text-align: center; }
+h2 { font-size: 1.1em; margin-top: 1.6em; }
+nav.top { font-size: 0.9em; margin-bottom: 1em; }
+p.info { margin: 0.4em 0; }
+table { border-collapse: collapse; width: 100%; font-size: 0.85em; }
+th, td { border: 1px solid #999; padding: 4px 6px; text-align: left; }
+th { background: #eee; }
+tr.current td { color: #c00; font-weight: bold; }
+.chart { overflow-x: auto; }
+.chart svg text { font-size: 9px; }
+.chart .gross { fill: #1f77b4; }
+.chart .budget { fill: #ff7f0e; }
+.chart .current { fill: #c00; }
+.pager button { margin: 0.5em 0.3em 0 0; }
+figcaption { font-size: 0.8em; text-align: center; }
+input.filter { width: 100%; padding: 4px; margin-bottom: 0.8em; }
+'''
+
+REPORT_JS = '''// show one page of the genre tables at a time
+document.querySelectorAll('.pages').forEach(function (pages) {
+  var sections = pages.querySelectorAll('section.page');
+  if (sections.length < 2) return;
+  var current = 0;
+  var pager = document.createElement('div');
+  pager.className = 'pager';
+  function show(index) {
+    current = index;
+    sections.forEach(function (section, i) { section.hidden = i !== index; });
+    pager.querySelectorAll('button').forEach(function (button, i) { button.disabled = i === index; });
+  }
+  sections.forEach(function (section, i) {
+    var button = document.createElement('button');
+    button.textContent = i + 1;
+    button.onclick = function () { show(i); };
+    pager.appendChild(button);
+  });
+  pages.appendChild(pager);
+  show(0);
+});
+// filter the rows of the index
+document.querySelectorAll('input.filter').forEach(function (input) {
+  var rows = document.querySelectorAll(input.dataset.rows);
+  input.oninput = function () {
+    var text = input.value.toLowerCase();
+    rows.forEach(function (row) { row.hidden = row.textContent.toLowerCase().indexOf(text) < 0; });
+  };
+});
+'''
+
+REPORT_TEMPLATE = '''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Report on the Movie "{{ title }}"</title>
+<link rel="stylesheet" href="report.css">
+</head>
+<body>
+{% if index %}<nav class="top"><a href="index.html">All movies</a></nav>
+{% endif %}
+<h1>Report on the Movie "{{ title }}"</h1>
+{% for info in infos %}<p class="info">{{ info }}</p>
+{% endfor %}
+<h2>Basic information about "{{ title }}"</h2>
+<table>
+{% for key, value in basic_info %}<tr><th>{{ key }}</th><td>{{ value }}</td></tr>
+{% endfor %}
+</table>
+<h2>Budget and Gross Worldwide</h2>
+<figure class="chart">
+{{ chart_svg }}
+<figcaption>Fig1. Budget and Gross Worldwide comparison chart of movies of the {{ genre }} genre</figcaption>
+</figure>
+<script type="application/json" id="chart-data">{{ chart | tojson }}</script>
+<div class="pages">
+{% for heading, rows in genre_tables %}<section class="page">
+<h2>{{ heading }}</h2>
+<table>
+<tr><th>Ranking</th><th>Movie</th><th>Score</th></tr>
+{% for rank, name, score in rows %}<tr{% if name == title %} class="current"{% endif %}><td>{{ rank }}</td><td>{% if pages[name] %}<a href="{{ pages[name] }}">{{ name }}</a>{% else %}{{ name }}{% endif %}</td><td>{{ score }}</td></tr>
+{% endfor %}
+</table>
+</section>
+{% endfor %}</div>
+<script src="report.js"></script>
+</body>
+</html>
+'''
+
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Reports on the Top {{ movies | length }} Movies</title>
+<link rel="stylesheet" href="report.css">
+</head>
+<body>
+<h1>Reports on the Top {{ movies | length }} Movies</h1>
+<input class="filter" data-rows="tbody tr" placeholder="Filter by title, year or genre">
+<table>
+<thead><tr><th>Ranking</th><th>Movie</th><th>Year</th><th>Genre</th><th>Score</th></tr></thead>
+<tbody>
+{% for movie in movies %}<tr><td>{{ loop.index }}</td><td>{% if pages[movie.Title] %}<a href="{{ pages[movie.Title] }}">{{ movie.Title }}</a>{% else %}{{ movie.Title }}{% endif %}</td><td>{{ movie.Year }}</td><td>{{ movie.Genre }}</td><td>{{ movie.Score }}</td></tr>
+{% endfor %}</tbody>
+</table>
+<script src="report.js"></script>
+</body>
+</html>
+'''
+
+
+def page_name(title):
+    """
+    The file name of the report of a movie, e.g. "the-shawshank-redemption.html".
+    """
+    name = re.sub(r'[^0-9a-z]+', '-', str(title).lower()).strip('-')
+    return '%s.html' % (name or 'movie')
+
+
+def bar_chart_svg(names, budget, gross, current=None, pages=None):
+    """
+    The budget and gross worldwide comparison chart as an inline SVG, the same bars as Movie.generate_histogram().
+    :param names: the movie names
+    :param budget: the budgets (log2 dollars)
+    :param gross: the worldwide grosses (log2 dollars)
+    :param current: the name of the searched movie, its label is red
+    :param pages: dict of movie name -> report file name, the labels then link to the reports
+    :return: Markup
+    """
+    pages = pages or {}
+    left, top, plot_height, label_height, group = 40, 10, 220, 170, 14
+    width = left + group * len(names) + 10
+    top_value = max([1] + list(budget) + list(gross))
+    scale = plot_height / top_value
+    baseline = top + plot_height
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" role="img">'
+             % (width, baseline + label_height)]
+    for tick in range(0, int(top_value) + 1, 5):
+        y = baseline - tick * scale
+        parts.append('<line x1="%d" x2="%d" y1="%.1f" y2="%.1f" stroke="#ddd"/><text x="%d" y="%.1f" '
+                     'text-anchor="end">%d</text>' % (left, width, y, y, left - 4, y + 3, tick))
+    for i, name in enumerate(names):
+        x = left + i * group
+        for offset, value, kind in ((1, gross[i], 'gross'), (7, budget[i], 'budget')):
+            parts.append('<rect class="%s" x="%d" y="%.1f" width="6" height="%.1f"><title>%s</title></rect>'
+                         % (kind, x + offset, baseline - value * scale, value * scale, Markup.escape(name)))
+        label = '<text x="%d" y="%d" transform="rotate(-90 %d %d)" text-anchor="end"%s>%s</text>' % (
+            x + 10, baseline + 6, x + 10, baseline + 6, ' class="current"' if name == current else '',
+            Markup.escape(name))
+        if pages.get(name):
+            label = '<a href="%s">%s</a>' % (Markup.escape(pages[name]), label)
+        parts.append(label)
+    parts.append('<text x="%d" y="%d">Dollar (log2): <tspan class="gross">&#9632;</tspan> Gross Worldwide '
+                 '<tspan class="budget">&#9632;</tspan> Budget</text>' % (left + 4, top + 8))
+    parts.append('</svg>')
+    return Markup(''.join(parts))
+
+
+class HtmlReportWriter:
+    def __init__(self, folder='./movie_html', titles=(), written_only=False):
+        """
+        Static html reports of movies, as a fast alternative to the pdf reports. The templates are compiled once
+        for all reports, and the css and JavaScript files are written once into the folder and shared by every page.
+        :param folder: the folder of the html files
+        :param titles: every movie that gets a report, the movie names in the reports link to those reports
+        :param written_only: link only to the reports and the index already in the folder, for a single report
+                             written without the rest of the site
+        """
+        self.folder = folder
+        self.written_only = written_only
+        environment = Environment(autoescape=True)
+        self.__report_template = environment.from_string(REPORT_TEMPLATE)
+        self.__index_template = environment.from_string(INDEX_TEMPLATE)
+        self.pages = {}
+        self.__used = set()
+        for title in titles:
+            self.__add_page(title)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        for file_name, content in (('report.css', REPORT_CSS), ('report.js', REPORT_JS)):
+            with open(os.path.join(folder, file_name), 'w', encoding='utf-8') as file:
+                file.write(content)
+
+    def __add_page(self, title):
+        """
+        Give a movie a report file name no other movie has, e.g. "the-thing-2.html" for the second "The Thing".
+        """
+        name = page_name(title)
+        number = 2
+        while name in self.__used:
+            name = page_name('%s %d' % (title, number))
+            number += 1
+        self.__used.add(name)
+        self.pages[title] = name
+
+    def __write(self, file_name, content):
+        path = os.path.join(self.folder, file_name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def __links(self):
+        """
+        The report file names the pages link to, and whether they link to the index.
+        """
+        if not self.written_only:
+            return self.pages, True
+        pages = {title: name for title, name in self.pages.items()
+                 if os.path.exists(os.path.join(self.folder, name))}
+        return pages, os.path.exists(os.path.join(self.folder, 'index.html'))
+
+    def write_report(self, report):
+        """
+        Write the report of a movie.
+        :param report: dict with title, genre, infos (the rank strings), basic_info (list of (key, value)),
+                       genre_tables (list of (heading, rows of (rank, name, score))) and chart (dict of the names and
+                       the log2 budget and gross lists), see Movie.html_report()
+        :return: the path of the html file
+        """
+        title = report['title']
+        if title not in self.pages:
+            self.__add_page(title)
+        pages, index = self.__links()
+        pages[title] = self.pages[title]
+        chart = report['chart']
+        chart_svg = bar_chart_svg(chart['names'], chart['budget'], chart['gross'], title, pages)
+        content = self.__report_template.render(report, chart_svg=chart_svg, pages=pages, index=index)
+        return self.__write(self.pages[title], content)
+
+
+    def write_index(self, movies):
+        """
+        Write index.html, the list of all movies with links to their reports.
+        :param movies: list of dict with the Title, Year, Genre and Score of every movie, in chart order
+        :return: the path of the html file
+        """
+        return self.__write('index.html', self.__index_template.render(movies=movies, pages=self.pages))
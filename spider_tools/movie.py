@@ -1,4 +1,5 @@
 import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import re
@@ -6,6 +7,8 @@ import os
 import math
 import sys
 import subprocess
+import importlib.metadata
+import functools
 from decimal import Decimal
 from pathlib import Path
 
@@ -15,18 +18,116 @@ except ImportError:
     subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'borb'])
 
 from borb.pdf import PDF, Document, Page, PageLayout, SingleColumnLayout, Image, \
-    Paragraph, Alignment, TableUtil, FixedColumnWidthTable
+    Paragraph, Alignment, FixedColumnWidthTable
 
 try:
     import xlrd
 except ImportError:
     subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'xlrd'])
 
+try:
+    from spider_tools.quantile_sketch import KLLSketch
+except ImportError:
+    from quantile_sketch import KLLSketch
+
+try:
+    from spider_tools.currency import CURRENCY_EXCHANGE_RATE, release_year, to_dollar_by_year, load_cpi, \
+        warn_unknown_currencies
+except ImportError:
+    from currency import CURRENCY_EXCHANGE_RATE, release_year, to_dollar_by_year, load_cpi, warn_unknown_currencies
+
+try:
+    from spider_tools.build_cache import input_hash
+except ImportError:
+    from build_cache import input_hash
+
+try:
+    from spider_tools.poster_store import PosterStore
+except ImportError:
+    from poster_store import PosterStore
+
+try:
+    from spider_tools.pdf_stream import StreamingPdfWriter, PageCanvas, UnsupportedTextError, to_win_ansi
+except ImportError:
+    from pdf_stream import StreamingPdfWriter, PageCanvas, UnsupportedTextError, to_win_ansi
+
+try:
+    from spider_tools.html_report import HtmlReportWriter
+except ImportError:
+    from html_report import HtmlReportWriter
+
 Folder = './'
 
+# bump when the chart or the pdf layout changes, so the outputs recorded in a BuildCache are built again
+CHART_RENDERER_VERSION = 'chart-1 matplotlib-%s' % matplotlib.__version__
+try:
+    PDF_RENDERER_VERSION = 'pdf-1 borb-%s' % importlib.metadata.version('borb')
+except importlib.metadata.PackageNotFoundError:
+    PDF_RENDERER_VERSION = 'pdf-1'
+
+# the excel read by the last Movie, match_title() initializes the movie again for every title
+_excel_cache = {}
+# the sketches built by the last Movie in sketch mode, shared by the reports of every title of the same data
+_sketch_cache = {}
+
+
+def read_excel(file_path):
+    """
+    Read the excel of the movies, once as long as the file does not change.
+    :param file_path: the file path of excel
+    :return: pd.DataFrame, a copy the caller may change
+    """
+    key = (os.path.abspath(file_path), os.path.getmtime(file_path))
+    if key not in _excel_cache:
+        _excel_cache.clear()
+        _excel_cache[key] = pd.read_excel(file_path)
+    return _excel_cache[key].copy()
+
+
+@functools.lru_cache(maxsize=None)
+def _split_country_or_language(country_or_language):
+    """
+    Split the languages or countries of a movie, written without separator ("United StatesJapan"). Cached, as
+    Movie splits the languages and countries of every movie again for each searched movie.
+    :return: tuple of str
+    """
+    country_or_language_split = country_or_language[0]
+    split_flag = 0
+    for i in country_or_language[1:]:
+        if split_flag == 1:
+            country_or_language_split += i
+            split_flag = 0
+        else:
+            if not i.isupper():
+                country_or_language_split += i
+            else:
+                country_or_language_split += ',' + i
+            if i == ' ':
+                split_flag = 1
+    return tuple(country_or_language_split.split(','))
+
+
+@functools.lru_cache(maxsize=None)
+def _find_money(money):
+    """
+    The (currency, amount) pairs found in an amount such as "$25,000,000 (estimated)". Cached, as Movie converts the
+    amounts of every movie again for each searched movie.
+    """
+    money = money.replace(',', '').replace(' ', '').replace('(estimated)', '').replace('\xa0', '')
+    return re.findall(r'(.*?)(\d+\.?\d*)', money)
+
+
+def _known(amounts):
+    """
+    The amounts that can be ranked, without the NaN of the amounts in a currency without exchange rate.
+    :return: list
+    """
+    return [amount for amount in amounts if not math.isnan(amount)]
+
 
 class Movie:
-    def __init__(self, file_path, title=None, currency_exchange_rate=None):
+    def __init__(self, file_path, title=None, currency_exchange_rate=None, boundary_mode='exact', sketch_k=200,
+                 build_cache=None, exchange_rates=None, inflation_year=None):
         """
         The initialization class contains 1. the basic information of the movie to be searched;
                                           2. the basic information of the same type of movie;
@@ -37,13 +138,27 @@ class Movie:
         :param title: the searched movie name
         :param currency_exchange_rate: a dictionary of the currency exchange rates, which contains "R$", "₩", "€", "¥",
                                        "DEM", "MVR", "FRF", "₹", "£" and "A$" exchange rate with US dollar.
+        :param boundary_mode: 'exact' sorts the converted budget and gross worldwide lists to get the thresholds and ranks,
+                              'sketch' answers them from KLL quantile sketches (approximate, see KLLSketch for the error bound),
+                              which avoids a full sort per report on a large catalog.
+        :param sketch_k: the accuracy parameter of the sketches, only used when boundary_mode is 'sketch'
+        :param build_cache: a BuildCache, the chart and the pdf are then only built again when their inputs changed
+        :param exchange_rates: a table of historical exchange rates (see currency.load_exchange_rates()), the amounts
+                               are then converted at the rate of their release year instead of currency_exchange_rate
+        :param inflation_year: with exchange_rates, the amounts are also adjusted for inflation to the dollars of
+                               that year
         """
+        if boundary_mode not in ('exact', 'sketch'):
+            raise ValueError("boundary mode must be 'exact' or 'sketch'")
         try:
             self.file_path = file_path
-            self.df = pd.read_excel(file_path)
+            self.df = read_excel(file_path)
         except (AssertionError, FileNotFoundError, ImportError):
             print("ERROR: File not found or failed to read file. Please check the file path you entered!")
             sys.exit()
+        # empty cells (e.g. the Language of "The General") are read as NaN, which never equals itself when ranking
+        text_columns = [column for column in ('Film rating', 'Genre', 'Language', 'Country') if column in self.df]
+        self.df[text_columns] = self.df[text_columns].fillna(' ')
 
         # 1. the basic information of the movie to be searched
         self.title = title
@@ -100,12 +215,26 @@ class Movie:
         self.__country_list = None
         self.__same_language_num_list = None
         self.__same_country_num_list = None
+
+        # 7. quantile sketches of budget and gross worldwide, globally and per genre (sketch mode only)
+        self.boundary_mode = boundary_mode
+        self.sketch_k = sketch_k
+        self.budget_sketch = None
+        self.gross_worldwide_sketch = None
+        self.genre_budget_sketches = None
+        self.genre_gross_worldwide_sketches = None
+        self.budget_percentile = None
+        self.gross_worldwide_percentile = None
+
+        # 8. content hashes of the outputs
+        self.build_cache = build_cache
         if currency_exchange_rate is None:
-            self.Currency_Exchange_Rate = {'R$': 0.18482475, '₩': 0.0007474863, '€': 1.0424475, '¥': 0.13893056, '$': 1,
-                                           'DEM': 0.53307053, 'MVR': 0.065187916, 'FRF': 0.15893336, '₹': 0.012246969,
-                                           '£': 1.2083902, 'A$': 0.67059245}
+            self.Currency_Exchange_Rate = dict(CURRENCY_EXCHANGE_RATE)
         else:
             self.Currency_Exchange_Rate = currency_exchange_rate
+        self.exchange_rates = exchange_rates
+        self.inflation_year = inflation_year
+        self.cpi = load_cpi() if inflation_year is not None else None
 
     def __exchange_rate_conversion(self, param_dataframe, param_feature):
         """
@@ -113,16 +242,23 @@ class Movie:
         the types of currencies are different, so all of them need to be converted into US dollars for comparison.
         :param param_dataframe: pd.DataFrame
         :param param_feature:
-        :return: List of converted amounts
+        :return: List of converted amounts, 0 for missing amounts and NaN for currencies without exchange rate, which
+                 are reported with a warning once per currency and left out of the ranks and boundaries
         """
+        if self.exchange_rates is not None:
+            if len(param_dataframe) == 0:
+                return False
+            dollars = to_dollar_by_year(param_dataframe[param_feature], release_year(param_dataframe['Year']),
+                                        self.exchange_rates, self.cpi, self.inflation_year)
+            return dollars.tolist()
         money_list = []
+        unknown = []
         try:
             if len(param_dataframe) == 0:
                 return False
+            money_column = param_dataframe[param_feature].to_list()
             for i in range(len(param_dataframe)):
-                money = param_dataframe.iloc[i][param_feature]
-                money = money.replace(',', '').replace(' ', '').replace('(estimated)', '').replace('\xa0', '')
-                money_find = re.findall(r'(.*?)(\d+\.?\d*)', money)
+                money_find = _find_money(money_column[i])
                 try:
                     currency_type = money_find[0][0]
                     amount = money_find[0][1]
@@ -131,24 +267,116 @@ class Movie:
                         dollar = int(amount) * self.Currency_Exchange_Rate[currency_type]
                     except ValueError:
                         dollar = 0
+                    except KeyError:
+                        unknown.append(currency_type)
+                        dollar = math.nan
                     finally:
                         money_list.append(dollar)
 
                 except IndexError:
                     money_list.append(0)
+            if unknown:
+                warn_unknown_currencies(unknown)
             return money_list
         except (KeyError, TypeError):
             print('ERROR: InputError')
             return False
 
+    def __sketch_key(self, param_dataframe):
+        """
+        What the sketches are built from: the amounts and genres of the movies, the exchange rates and sketch_k.
+        The data of the excel is known by its path and modification time, other data by the hash of its rows.
+        """
+        if param_dataframe is self.df:
+            rows = (os.path.abspath(self.file_path), os.path.getmtime(self.file_path))
+        else:
+            columns = ['Genre', 'Budget', 'Gross worldwide'] + (['Year'] if self.exchange_rates is not None else [])
+            rows = int(pd.util.hash_pandas_object(param_dataframe[columns], index=False).sum())
+
+        exchange_rates = None
+        if self.exchange_rates is not None:
+            exchange_rates = int(pd.util.hash_pandas_object(self.exchange_rates, index=False).sum())
+        cpi = None if self.cpi is None else int(pd.util.hash_pandas_object(self.cpi).sum())
+        return (len(param_dataframe), rows, self.sketch_k,
+                input_hash(self.Currency_Exchange_Rate, exchange_rates, self.inflation_year, cpi))
+
+
+    def build_sketches(self, param_dataframe):
+        """
+        Build the KLL sketches of budget and gross worldwide for every genre, then merge them into the global sketches.
+        The sketches are built once and shared by every Movie of the same data, so the amounts of the whole column are
+        not converted again for every report.
+        :param param_dataframe: pd.DataFrame
+        :return:
+        """
+        key = self.__sketch_key(param_dataframe)
+        if key in _sketch_cache:
+            (self.budget_sketch, self.gross_worldwide_sketch, self.genre_budget_sketches,
+             self.genre_gross_worldwide_sketches) = _sketch_cache[key]
+            return
+        self.genre_budget_sketches = {}
+        self.genre_gross_worldwide_sketches = {}
+        self.budget_sketch = KLLSketch(self.sketch_k)
+        self.gross_worldwide_sketch = KLLSketch(self.sketch_k)
+        for genre, genre_dataframe in param_dataframe.groupby('Genre', sort=False):
+            budget_sketch = KLLSketch(self.sketch_k)
+            gross_worldwide_sketch = KLLSketch(self.sketch_k)
+            budget_sketch.extend(_known(self.__exchange_rate_conversion(genre_dataframe, 'Budget')))
+            gross_worldwide_sketch.extend(_known(self.__exchange_rate_conversion(genre_dataframe, 'Gross worldwide')))
+            self.genre_budget_sketches[genre] = budget_sketch
+            self.genre_gross_worldwide_sketches[genre] = gross_worldwide_sketch
+            self.budget_sketch.merge(budget_sketch)
+            self.gross_worldwide_sketch.merge(gross_worldwide_sketch)
+        _sketch_cache.clear()
+        _sketch_cache[key] = (self.budget_sketch, self.gross_worldwide_sketch, self.genre_budget_sketches,
+                              self.genre_gross_worldwide_sketches)
+
+    def percentile_rank(self, param_feature, value, genre=None):
+        """
+        Approximate percentage of movies whose budget or gross worldwide is lower than value.
+        :param param_feature: 'Budget' or 'Gross worldwide'
+        :param value: the amount in US dollars
+        :param genre: rank within this genre only (a ValueError if no movie has it), or within all movies if None
+        :return: float in 0-100
+
+        """
+        if self.budget_sketch is None:
+            self.build_sketches(self.df)
+        if param_feature == 'Budget':
+            sketches = self.genre_budget_sketches
+            sketch = self.budget_sketch
+        elif param_feature == 'Gross worldwide':
+            sketches = self.genre_gross_worldwide_sketches
+            sketch = self.gross_worldwide_sketch
+        else:
+            raise ValueError("feature must be 'Budget' or 'Gross worldwide'")
+        if genre is not None:
+            if genre not in sketches:
+                raise ValueError('no movie has the genre "%s", the genres are %s' % (genre, ', '.join(sorted(sketches))))
+            sketch = sketches[genre]
+        return sketch.percentile_rank(value)
+
+
     def set_boundaries(self, param_dataframe):
         """
         Set Budget and Gross WorldWide high, medium and low bounds based on Dataframe
         :param param_dataframe: pd.DataFrame
         :return:
         """
-        budget_list = self.__exchange_rate_conversion(param_dataframe, 'Budget')
-        gross_worldwide_list = self.__exchange_rate_conversion(param_dataframe, 'Gross worldwide')
+        if self.boundary_mode == 'sketch':
+            if self.budget_sketch is None:
+                self.build_sketches(param_dataframe)
+            # the same positions of the sorted amounts as the exact thresholds below
+            medium = int(self.budget_sketch.count / 3)
+            high = 2 * medium
+            self.__high_budget_limit = self.budget_sketch.value_at(high)
+            self.__medium_budget_limit = self.budget_sketch.value_at(medium-1)
+            self.__high_gross_worldwide_limit = self.gross_worldwide_sketch.value_at(high)
+            self.__medium_gross_worldwide_limit = self.gross_worldwide_sketch.value_at(medium-1)
+            return
+
+        budget_list = _known(self.__exchange_rate_conversion(param_dataframe, 'Budget'))
+        gross_worldwide_list = _known(self.__exchange_rate_conversion(param_dataframe, 'Gross worldwide'))
         budget_list.sort()
         gross_worldwide_list.sort()
         medium = int(len(budget_list) / 3)
@@ -183,11 +411,12 @@ class Movie:
             value_list_ranked.sort()
             rank = value_list_ranked.index(exchange_param_feature_value) + 1
         elif param_feature in ['Budget', 'Gross worldwide']:
-            value_list_ranked = sorted(parma_list)
-            if param_feature == 'Budget':
-                rank = value_list_ranked.index(self.budget)
-            else:
-                rank = value_list_ranked.index(self.gross_worldwide)
+            value = self.budget if param_feature == 'Budget' else self.gross_worldwide
+            # an amount in a currency without exchange rate has no rank
+            if math.isnan(value):
+                return None
+            value_list_ranked = sorted(_known(parma_list))
+            rank = value_list_ranked.index(value)
         elif param_feature in ['Language', 'Country']:
             if param_feature == 'Language':
                 param1 = self.language
@@ -197,38 +426,27 @@ class Movie:
                 param2 = self.__country_list
             rank = [0 for i in range(len(param1))]
             same_feature_value_num = [0 for i in range(len(param1))]
+            titles = self.df['Title'].to_list()
             for i in range(len(param1)):
                 for j in range(len(param2)):
                     if param1[i] in param2[j]:
                         same_feature_value_num[i] += 1
-                    if self.df.iloc[j]['Title'] == self.title:
+                    if titles[j] == self.title:
                         rank[i] = same_feature_value_num[i]
             return rank, same_feature_value_num
         else:
             same_feature_value = []
+            values = param_dataframe[param_feature].to_list()
+            titles = param_dataframe['Title'].to_list()
             for i in range(len(param_dataframe)):
-                if param_dataframe.iloc[i][param_feature] == param_feature_value:
-                    same_feature_value.append(param_dataframe.iloc[i]['Title'])
+                if values[i] == param_feature_value:
+                    same_feature_value.append(titles[i])
             rank = same_feature_value.index(param_title) + 1
         return rank
 
     @staticmethod
     def __split_country_or_language(country_or_language):
-        country_or_language_split = country_or_language[0]
-        split_flag = 0
-        for i in country_or_language[1:]:
-            if split_flag == 1:
-                country_or_language_split += i
-                split_flag = 0
-            else:
-                if not i.isupper():
-                    country_or_language_split += i
-                else:
-                    country_or_language_split += ',' + i
-                if i == ' ':
-                    split_flag = 1
-        country_or_language_split_list = country_or_language_split.split(',')
-        return country_or_language_split_list
+        return list(_split_country_or_language(country_or_language))
 
     def set_rank(self):
         """
@@ -239,17 +457,32 @@ class Movie:
 
         self.film_rating_rank = self.__set_rank(param_dataframe=self.df, param_feature='Film rating', param_feature_value=self.film_rating, param_title=self.title)
         self.rating_numbers_rank = self.__set_rank(param_dataframe=self.df, param_feature='Rating Numbers', param_feature_value=self.rating_numbers)
-        self.budget_rank = self.__set_rank(param_feature='Budget', parma_list=self.__budget_list)
-        self.gross_worldwide_rank = self.__set_rank(param_feature='Gross worldwide', parma_list=self.__gross_worldwide_list)
+        if self.boundary_mode == 'sketch':
+            self.budget_rank, self.related_budget_rank, self.budget_percentile = None, None, None
+            self.gross_worldwide_rank, self.related_gross_worldwide_rank, self.gross_worldwide_percentile = None, None, None
+            # an amount in a currency without exchange rate has no rank
+            if not math.isnan(self.budget):
+                self.budget_rank = self.budget_sketch.rank(self.budget)
+                self.related_budget_rank = self.genre_budget_sketches[self.genre].rank(self.budget)
+                self.budget_percentile = self.budget_sketch.percentile_rank(self.budget)
+            if not math.isnan(self.gross_worldwide):
+                self.gross_worldwide_rank = self.gross_worldwide_sketch.rank(self.gross_worldwide)
+                self.related_gross_worldwide_rank = self.genre_gross_worldwide_sketches[self.genre].rank(self.gross_worldwide)
+                self.gross_worldwide_percentile = self.gross_worldwide_sketch.percentile_rank(self.gross_worldwide)
+        else:
+            self.budget_rank = self.__set_rank(param_feature='Budget', parma_list=self.__budget_list)
+            self.gross_worldwide_rank = self.__set_rank(param_feature='Gross worldwide', parma_list=self.__gross_worldwide_list)
 
-        self.related_budget_rank = self.__set_rank(param_feature='Budget', parma_list=self.__related_budget_list)
-        self.related_gross_worldwide_rank = self.__set_rank(param_feature='Gross worldwide', parma_list=self.__related_gross_worldwide_list)
+            self.related_budget_rank = self.__set_rank(param_feature='Budget', parma_list=self.__related_budget_list)
+            self.related_gross_worldwide_rank = self.__set_rank(param_feature='Gross worldwide', parma_list=self.__related_gross_worldwide_list)
 
         self.__country_list = []
         self.__language_list = []
+        countries = self.df['Country'].to_list()
+        languages = self.df['Language'].to_list()
         for i in range(len(self.df)):
-            self.__country_list.append(self.__split_country_or_language(self.df.iloc[i]['Country']))
-            self.__language_list.append(self.__split_country_or_language(self.df.iloc[i]['Language']))
+            self.__country_list.append(self.__split_country_or_language(countries[i]))
+            self.__language_list.append(self.__split_country_or_language(languages[i]))
 
         self.language_rank, self.__same_language_num_list = self.__set_rank(param_feature='Language')
         self.country_rank, self.__same_country_num_list = self.__set_rank(param_feature='Country')
@@ -265,15 +498,17 @@ class Movie:
         related_movie_name = []
         rank = 0
         genre_rank = 0
+        genres = self.df['Genre'].to_list()
+        titles = self.df['Title'].to_list()
         for i in range(len(self.df)):
-            if self.df.iloc[i]['Genre'] == param_genre:
+            if genres[i] == param_genre:
                 rank += 1
-                related_list.append(self.df.iloc[i])
-                related_movie_name.append(self.df.iloc[i]['Title'])
+                related_list.append(i)
+                related_movie_name.append(titles[i])
 
-            if self.df.iloc[i]['Title'] == param_title:
+            if titles[i] == param_title:
                 genre_rank = rank
-        self.__related_df = pd.DataFrame(related_list)
+        self.__related_df = self.df.iloc[related_list]
         self.__related_movie_name = related_movie_name
         self.__related_budget_list = self.__exchange_rate_conversion(self.__related_df, 'Budget')
         self.__related_gross_worldwide_list = self.__exchange_rate_conversion(self.__related_df, 'Gross worldwide')
@@ -288,11 +523,13 @@ class Movie:
         if title is None:
             title = self.title
         else:
-            self.__init__(self.file_path, title)
+            self.__init__(self.file_path, title, self.Currency_Exchange_Rate, self.boundary_mode, self.sketch_k,
+                          self.build_cache, self.exchange_rates, self.inflation_year)
 
         self.__whether_match = False
+        titles = self.df['Title'].to_list()
         for i in range(len(self.df)):
-            if self.df.iloc[i]['Title'] == title:
+            if titles[i] == title:
                 self.__whether_match = True
                 self.basic_info = self.df.iloc[i]
                 self.genre = self.df.iloc[i]['Genre']
@@ -302,8 +539,11 @@ class Movie:
                 self.budget = self.__exchange_rate_conversion(self.df.iloc[[i]], 'Budget')[0]
                 self.gross_worldwide = self.__exchange_rate_conversion(self.df.iloc[[i]], 'Gross worldwide')[0]
                 self.country = self.__split_country_or_language(self.df.iloc[i]['Country'])
-                self.__budget_list = self.__exchange_rate_conversion(self.df, 'Budget')
-                self.__gross_worldwide_list = self.__exchange_rate_conversion(self.df, 'Gross worldwide')
+                if self.boundary_mode == 'exact':
+                    # sketch mode ranks from the shared sketches, without converting the whole column
+                    self.__budget_list = self.__exchange_rate_conversion(self.df, 'Budget')
+                    self.__gross_worldwide_list = self.__exchange_rate_conversion(self.df, 'Gross worldwide')
+
                 self.__set_genre_relative_movie(self.genre, title)
                 self.set_boundaries(self.df)
                 self.set_rank()
@@ -323,14 +563,47 @@ class Movie:
 
     @staticmethod
     def log2(value):
+        # missing amounts and amounts without exchange rate are drawn as no bar
         try:
-            return math.log2(value)
+            return 0 if math.isnan(value) else math.log2(value)
         except ValueError:
             return 0
 
+    def chart_input_hash(self, param_dataframe=None):
+        """
+        Content hash of everything the comparison chart is drawn from: the budget and gross worldwide of the movies
+        of the same genre, with the exchange rate table also their years and the consumer price index when the
+        amounts are adjusted for inflation, the exchange rates and the renderer version.
+        :param param_dataframe: pd.DataFrame, the movies of the same genre if None
+        :return: str
+        """
+        if param_dataframe is None:
+            param_dataframe = self.__related_df
+        columns = ['Title', 'Budget', 'Gross worldwide'] + (['Year'] if self.exchange_rates is not None else [])
+        rows = param_dataframe[columns].values.tolist()
+        exchange_rates = None if self.exchange_rates is None else self.exchange_rates.values.tolist()
+        cpi = None if self.cpi is None else list(self.cpi.items())
+        return input_hash(CHART_RENDERER_VERSION, self.title, self.genre, self.__related_movie_name, rows,
+                          self.Currency_Exchange_Rate, exchange_rates, self.inflation_year, cpi)
+
+    def report_input_hash(self):
+        """
+        Content hash of everything the pdf report shows. The ranks are hashed after they are computed, so the hash
+        changes exactly when a rank, a threshold or a row of the report changes, whichever rows caused it.
+        :return: str
+        """
+        poster_path = PosterStore(Folder + 'movie_poster').thumbnail_path(self.title)
+        related = self.__related_df[['Title', 'Score']].values.tolist()
+        return input_hash(PDF_RENDERER_VERSION, self.title, self.genre_rank_info_string, self.language_rank_info_string,
+                          self.country_rank_info_string, self.film_rating_rank_info_string,
+                          self.rating_numbers_rank_info_string, self.amount_info_string,
+                          self.basic_info.to_dict(), self.language, self.country, related,
+                          self.chart_input_hash(self.__related_df), poster_path)
+
     def generate_histogram(self, param_dataframe=None):
         """
         Generate budget and worldwide gross comparison charts based on movies of the same genre, and then save it.
+        With a build cache, the chart is not drawn again if it was saved from the same inputs.
         :param param_dataframe:
         :return:
         """
@@ -342,6 +615,11 @@ class Movie:
             except InputError as error:
                 print(error)
                 sys.exit()
+        chart_path = Folder + 'movie_chart/%s bar chart.jpg' % self.title
+        if self.build_cache is not None:
+            digest = self.chart_input_hash(param_dataframe)
+            if self.build_cache.is_fresh(chart_path, digest):
+                return
         budget_list = self.__exchange_rate_conversion(param_dataframe, 'Budget')
         gross_worldwide_list = self.__exchange_rate_conversion(param_dataframe, 'Gross worldwide')
         budget_list_log = []
@@ -382,6 +660,8 @@ class Movie:
             if not os.path.exists(folder):
                 os.makedirs(folder)
             fig.savefig(r'%s/%s bar chart.jpg' % (folder, self.title), bbox_inches='tight')
+            if self.build_cache is not None:
+                self.build_cache.record(chart_path, digest)
 
     def set_print_info(self):
         """
@@ -410,7 +690,10 @@ class Movie:
             self.film_rating_rank_info_string = '"%s" ranked No.%d in %s film rating movie.\n' % (self.title, self.film_rating_rank, self.film_rating)
             self.rating_numbers_rank_info_string = 'Based on the number of votes (%s) from IMDb users, "%s" was ranked No.%d out of the top 250 movies.\n' % (self.rating_numbers, self.title, self.rating_numbers_rank)
 
-            if self.budget >= self.__high_budget_limit:
+            if math.isnan(self.budget):
+                grade = None
+                budget_info = '"%s" has a budget in a currency without exchange rate,' % self.title
+            elif self.budget >= self.__high_budget_limit:
                 grade = 'high'
                 budget_info = '"%s" is a high-budget ($%.2f) movie ' % (self.title, self.budget)
             else:
@@ -420,9 +703,12 @@ class Movie:
                 else:
                     grade = 'low'
                     budget_info = '"%s" is a low-budget ($%.2f) movie ' % (self.title, self.budget)
-            budget_info += '(its budget ranks No.%d in the top 250 movies and No.%d / %d in %s genre),' % (self.budget_rank, self.related_budget_rank, len(self.__related_budget_list), self.genre)
+            if grade is not None:
+                budget_info += '(its budget ranks No.%d in the top 250 movies and No.%d / %d in %s genre),' % (self.budget_rank, self.related_budget_rank, len(_known(self.__related_budget_list)), self.genre)
 
-            if self.gross_worldwide >= self.__high_gross_worldwide_limit:
+            if math.isnan(self.gross_worldwide):
+                gross_worldwide_info = ' and its worldwide gross is in a currency without exchange rate.\n'
+            elif self.gross_worldwide >= self.__high_gross_worldwide_limit:
                 if grade == 'high':
                     gross_worldwide_info = ' and '
                 else:
@@ -441,7 +727,9 @@ class Movie:
                     else:
                         gross_worldwide_info = ' but '
                     gross_worldwide_info += 'its worldwide gross ($%.2f) is low ' % self.gross_worldwide
-            gross_worldwide_info += '(it ranks No.%d in the top 250 movies and No.%d / %d in %s genre).\n' % (self.gross_worldwide_rank, self.related_gross_worldwide_rank, len(self.__related_gross_worldwide_list), self.genre)
+            if not math.isnan(self.gross_worldwide):
+                gross_worldwide_info += '(it ranks No.%d in the top 250 movies and No.%d / %d in %s genre).\n' % (self.gross_worldwide_rank, self.related_gross_worldwide_rank, len(_known(self.__related_gross_worldwide_list)), self.genre)
+
 
             amount_info_string += budget_info + gross_worldwide_info
             self.amount_info_string = amount_info_string
@@ -454,8 +742,7 @@ class Movie:
             table_info_string += ' ' + '-' * 76 + '\n'
 
             rank = 0
-            for i in range(len(self.__related_df)):
-                movie_info = self.__related_df.iloc[i]
+            for movie_info in self.__related_df[['Title']].to_dict('records'):
                 rank += 1
                 if movie_info['Title'] == self.title:
                     table_info_string += '| \033[31mNo.%d %s\033[0m' % (rank, movie_info['Title'])
@@ -486,38 +773,76 @@ class Movie:
     def output_pdf(self):
         """
         Use the borb library to generate a pdf report of the searched movies based on the output information.
+        With a build cache, the pdf is not generated again if it was saved from the same inputs.
         :return:
         """
+        pdf_path = '%s/Report on the Movie (%s).pdf' % (Folder + 'movie_pdf', self.title)
+        if self.build_cache is not None:
+            digest = self.report_input_hash()
+            if self.build_cache.is_fresh(pdf_path, digest):
+                print('PDF is up to date.')
+                return
         print('PDF is being generated...')
         pdf = Document()
 
-        # Create empty Page
-        page: Page = Page()
+        for report_page in self.__report_layout():
+            # Create empty Page
+            page: Page = Page()
 
-        # Add Page to Document
-        pdf.add_page(page)
+            # Add Page to Document
+            pdf.add_page(page)
 
-        # Create PageLayout
-        layout: PageLayout = SingleColumnLayout(page)
+            # Create PageLayout
+            layout: PageLayout = SingleColumnLayout(page)
 
-        # Write title
-        layout.add(Paragraph('Report on the Movie "%s"' % self.title,
-                             font="Helvetica-Bold", horizontal_alignment=Alignment.CENTERED))
+            for block in report_page['blocks']:
+                layout.add(self.__borb_element(block))
 
-        layout.add(Paragraph('%s' % self.genre_rank_info_string, font_size=Decimal(10)))
-        layout.add(Paragraph('%s' % self.language_rank_info_string, font_size=Decimal(10)))
-        layout.add(Paragraph('%s' % self.country_rank_info_string, font_size=Decimal(10)))
-        layout.add(Paragraph('%s' % self.film_rating_rank_info_string, font_size=Decimal(10)))
-        layout.add(Paragraph('%s' % self.rating_numbers_rank_info_string, font_size=Decimal(10)))
-        layout.add(Paragraph('%s' % self.amount_info_string, font_size=Decimal(10)))
+        folder = Folder + 'movie_pdf'
+        if not os.path.exists(folder):
+            os.makedirs(folder)
 
-        layout.add(Paragraph('Basic information about "%s": ' % self.title, font_size=Decimal(10)))
+        with open(pdf_path, "wb") as pdf_file_handle:
+            PDF.dumps(pdf_file_handle, pdf)
+        if self.build_cache is not None:
+            self.build_cache.record(pdf_path, digest)
+        print('PDF generation complete!')
 
+    @staticmethod
+    def __borb_element(block):
+        """
+        The borb layout element of a block of __report_layout().
+        :param block: dict
+        :return: LayoutElement
+        """
+        if block['kind'] == 'image':
+            return Image(Path(block['path']), width=Decimal(block['width']), height=Decimal(block['height']),
+                         horizontal_alignment=Alignment.CENTERED)
+        if block['kind'] == 'paragraph':
+            alignment = Alignment.CENTERED if block['align'] == 'center' else Alignment.LEFT
+            return Paragraph(block['text'], font=block['font'], font_size=Decimal(block['size']),
+                             horizontal_alignment=alignment)
+        rows = block['rows']
         # generate FixedColumnWidthTable
         t: FixedColumnWidthTable = FixedColumnWidthTable(
-            number_of_rows=len(self.basic_info), number_of_columns=2, margin_top=Decimal(12)
+            number_of_rows=len(rows), number_of_columns=len(rows[0]),
+            column_widths=[Decimal(weight) for weight in block['column_weights']], margin_top=Decimal(12)
         )
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                bold = (block['bold_first_row'] and r == 0) or (block['bold_first_column'] and c == 0)
+                t.add(Paragraph(value, font="Helvetica-Bold" if bold else "Helvetica", font_size=Decimal(block['size'])))
 
+        # set properties on all table cells
+        t.set_padding_on_all_cells(Decimal(5), Decimal(5), Decimal(5), Decimal(5))
+        return t
+
+    def __basic_info_rows(self):
+        """
+        The rows of the basic information table of the pdf report, with the languages and countries separated by commas.
+        :return: list of (key, value)
+        """
+        rows = []
         for i in range(len(self.basic_info)):
             key = str(self.basic_info.keys()[i])
             value = ''
@@ -532,16 +857,16 @@ class Movie:
                     if j != len(self.country)-1:
                         value += ', '
             else:
-                # value = str(self.language)
                 value = str(self.basic_info.iloc[i])
-            t.add(Paragraph(key, font="Helvetica-Bold", font_size=Decimal(8)))          # add table heading
-            t.add(Paragraph(value, font_size=Decimal(8)))
-
-        # set properties on all table cells
-        t.set_padding_on_all_cells(Decimal(5), Decimal(5), Decimal(5), Decimal(5))
-
-        layout.add(t)
+            rows.append((key, value))
+        return rows
 
+    def __genre_tables(self):
+        """
+        The pages of the table of all movies in the genre of the searched movie, 26 movies per page.
+        :return: list of (heading, np.ndarray with the Ranking, Movie and Score columns and a header row)
+        """
+        tables = []
         current = 0
         while current < len(self.__related_df)-1:
             past = current
@@ -552,49 +877,175 @@ class Movie:
             rank = np.array([i + 1 for i in range(past, current)])
             table = np.insert(table_dataframe, 0, values=rank, axis=1)
             table = np.insert(table, 0, values=["Ranking", "Movie", "Score"], axis=0)
-            new_page: Page = Page()
-            pdf.add_page(new_page)
-            layout: PageLayout = SingleColumnLayout(new_page)
             paragraph_string = 'All movies in the "%s" genre' % self.genre
             if current > 26:
                 paragraph_string += ' (Continuation):'
             else:
                 paragraph_string += ':'
+            tables.append((paragraph_string, table))
+        return tables
 
-            layout.add(Paragraph(paragraph_string, horizontal_alignment=Alignment.CENTERED))
-
-            layout.add(
-                TableUtil.from_2d_array(
-                    table
-                )
-            )
-
-        new_page: Page = Page()
-        pdf.add_page(new_page)
-        layout: PageLayout = SingleColumnLayout(new_page)
+    def __report_layout(self):
+        """
+        The pages of the pdf report of the searched movie, the one layout both output_pdf() and output_combined_pdf()
+        draw. Every page is a dict with the 'blocks' laid out top to bottom and whether it is 'shared' by all movies
+        of the genre. A block is a dict with its 'kind' ('paragraph', 'image' or 'table') and the arguments of the
+        PageCanvas method of that name, with the file 'path' of an image.
+        :return: list of dict
+        """
+        blocks = [{'kind': 'paragraph', 'text': 'Report on the Movie "%s"' % self.title, 'font': 'Helvetica-Bold',
+                   'size': 12, 'align': 'center'}]
+
+        # the poster is embedded from the thumbnail cached by the spider, if there is one
+        poster_path = PosterStore(Folder + 'movie_poster').thumbnail_path(self.title)
+        if poster_path is not None:
+            blocks.append({'kind': 'image', 'path': poster_path, 'width': 100, 'height': 148})
+        for info_string in (self.genre_rank_info_string, self.language_rank_info_string,
+                            self.country_rank_info_string, self.film_rating_rank_info_string,
+                            self.rating_numbers_rank_info_string, self.amount_info_string,
+                            'Basic information about "%s": ' % self.title):
+            blocks.append({'kind': 'paragraph', 'text': info_string, 'font': 'Helvetica', 'size': 10, 'align': 'left'})
+        blocks.append({'kind': 'table', 'rows': [list(row) for row in self.__basic_info_rows()],
+                       'column_weights': [1, 1], 'size': 8, 'bold_first_row': False, 'bold_first_column': True})
+        pages = [{'blocks': blocks, 'shared': False}]
+
+        for paragraph_string, table in self.__genre_tables():
+            pages.append({'shared': True, 'blocks': [
+                {'kind': 'paragraph', 'text': paragraph_string, 'font': 'Helvetica', 'size': 12, 'align': 'center'},
+                {'kind': 'table', 'rows': [[str(value) for value in row] for row in table], 'column_weights': [1, 5, 1],
+                 'size': 10, 'bold_first_row': True, 'bold_first_column': False}]})
 
         chart_path = Folder + 'movie_chart/%s bar chart.jpg' % self.title
-
-        if not os.path.exists(chart_path):
+        if self.build_cache is not None or not os.path.exists(chart_path):
             self.generate_histogram(self.__related_df)
-
-        layout.add(
-            Image(
-                Path(chart_path),
-                width=Decimal(450),
-                height=Decimal(250),
-                horizontal_alignment=Alignment.CENTERED,
-            )
-        )
-        layout.add(Paragraph('Fig1. Budget and Gross Worldwide comparison chart of movies of the %s genre' % self.genre,
-                             font_size=Decimal(8), horizontal_alignment=Alignment.CENTERED))
+            plt.close('all')
+        pages.append({'shared': False, 'blocks': [
+            {'kind': 'image', 'path': chart_path, 'width': 450, 'height': 250},
+            {'kind': 'paragraph', 'text': 'Fig1. Budget and Gross Worldwide comparison chart of movies of the %s genre'
+                                          % self.genre, 'font': 'Helvetica', 'size': 8, 'align': 'center'}]})
+        return pages
+
+    def __write_report_pages(self, writer, pages):
+        """
+        Write the pages of __report_layout() to a StreamingPdfWriter. The shared pages are written as forms, so they
+        are stored once for all movies of a genre.
+        :param writer: StreamingPdfWriter
+        :param pages: the result of __report_layout()
+        :return: the object number of the first page
+        """
+        # every text is checked before the first page is written, so a rejected report leaves nothing in the pdf
+        for page in pages:
+            for block in page['blocks']:
+                if block['kind'] == 'paragraph':
+                    to_win_ansi(block['text'])
+                elif block['kind'] == 'table':
+                    for row in block['rows']:
+                        for value in row:
+                            to_win_ansi(value)
+
+        first_page = None
+        for page in pages:
+            canvas = PageCanvas()
+            for block in page['blocks']:
+                arguments = {key: value for key, value in block.items() if key not in ('kind', 'path')}
+                if block['kind'] == 'image':
+                    canvas.image(writer.add_image(block['path']), **arguments)
+                else:
+                    getattr(canvas, block['kind'])(**arguments)
+            if page['shared']:
+                form = writer.add_form(canvas)
+                canvas = PageCanvas()
+                canvas.form(form)
+            number = writer.add_page(canvas)
+            if first_page is None:
+                first_page = number
+        return first_page
+
+    def output_combined_pdf(self, titles=None, file_name='Report on the Top 250 Movies.pdf'):
+        """
+        Generate one pdf with the reports of many movies and a bookmark per movie, instead of one pdf per movie.
+        The pages are written to the file as each report is built, so memory does not grow with the number of movies,
+        the fonts are shared by every page, and the genre tables and images repeated between reports are embedded once.
+        A report with characters the standard fonts do not have is left out with a message.
+        :param titles: the movie names, every movie of the excel in order if None
+        :param file_name: the name of the pdf in movie_pdf
+        :return: the path of the pdf
+        """
+        if titles is None:
+            titles = list(self.df['Title'])
         folder = Folder + 'movie_pdf'
         if not os.path.exists(folder):
             os.makedirs(folder)
-
-        with open('%s/Report on the Movie (%s).pdf' % (folder, self.title), "wb") as pdf_file_handle:
-            PDF.dumps(pdf_file_handle, pdf)
+        pdf_path = '%s/%s' % (folder, file_name)
+        print('PDF is being generated...')
+        with StreamingPdfWriter(pdf_path) as writer:
+            for title in titles:
+                self.match_title(title)
+                if self.__whether_match:
+                    try:
+                        first_page = self.__write_report_pages(writer, self.__report_layout())
+                    except UnsupportedTextError as error:
+                        print('The report on "%s" is left out: %s' % (self.title, error))
+                        continue
+                    writer.add_bookmark(self.title, first_page)
         print('PDF generation complete!')
+        return pdf_path
+
+    def html_report(self):
+        """
+        The content of the report of the searched movie for HtmlReportWriter: the same rank strings, tables and chart
+        data as the pdf report, without rendering the chart image.
+        :return: dict
+        """
+        # the same pages as __genre_tables(), built from the column lists instead of a DataFrame per page
+        names = self.__related_df['Title'].to_list()
+        scores = self.__related_df['Score'].to_list()
+        genre_tables = []
+        for start in range(0, max(len(names) - 1, 0), 26):
+            end = len(names) if start + 26 >= len(names) - 1 else start + 26
+            heading = 'All movies in the "%s" genre%s' % (self.genre, ' (Continuation):' if start else ':')
+            genre_tables.append((heading, [[str(i + 1), str(names[i]), str(scores[i])] for i in range(start, end)]))
+        return {
+            'title': self.title,
+            'genre': self.genre,
+            'infos': [info_string.strip() for info_string in (
+                self.genre_rank_info_string, self.language_rank_info_string, self.country_rank_info_string,
+                self.film_rating_rank_info_string, self.rating_numbers_rank_info_string, self.amount_info_string)],
+            'basic_info': self.__basic_info_rows(),
+            'genre_tables': genre_tables,
+            'chart': {'names': self.__related_movie_name,
+                      'budget': [self.log2(value) for value in self.__related_budget_list],
+                      'gross': [self.log2(value) for value in self.__related_gross_worldwide_list]},
+        }
+
+    def output_html(self, folder=None):
+        """
+        Generate the html report of the searched movie in movie_html, a fast alternative to output_pdf().
+        The movie names link only to the reports already in the folder, e.g. from output_html_site().
+        :param folder: the folder of the html files, movie_html if None
+        :return: the path of the html file
+        """
+        writer = HtmlReportWriter(folder or Folder + 'movie_html', self.df['Title'].to_list(), written_only=True)
+        return writer.write_report(self.html_report())
+
+
+    def output_html_site(self, titles=None, folder=None):
+        """
+        Generate the html reports of many movies and an index page linking to them, in movie_html.
+        The movie names of the genre tables, the charts and the index link to the reports of those movies.
+        :param titles: the movie names, every movie of the excel in order if None
+        :param folder: the folder of the html files, movie_html if None
+        :return: the path of the index page
+        """
+        if titles is None:
+            titles = self.df['Title'].to_list()
+        movies = self.df[['Title', 'Year', 'Genre', 'Score']].to_dict('records')
+        writer = HtmlReportWriter(folder or Folder + 'movie_html', titles)
+        for title in titles:
+            self.match_title(title)
+            if self.__whether_match:
+                writer.write_report(self.html_report())
+        return writer.write_index(movies)
 
     def main(self, title=None):
         if title is None:
@@ -0,0 +1,187 @@
+import os
+import json
+import zlib
+import hashlib
+import threading
+from multiprocessing import Pool
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _reparse_chunk(args):
+    """
+    Worker of PageArchive.reparse(), it opens the archive by itself so only the keys are sent to the process.
+    """
+    folder, keys, parser = args
+    archive = PageArchive(folder)
+    result = []
+    for key in keys:
+        try:
+            result.append((key, parser(archive.get(key))))
+        except Exception as error:
+            result.append((key, error))
+    archive.close()
+    return result
+
+
+class PageArchive:
+    def __init__(self, folder='./page_archive', level=10):
+        """
+        Append-only archive of raw pages. Every page is compressed on its own (zstd when the zstandard package is
+        installed, zlib otherwise) and appended to pages.bin; index.jsonl records its offset and length, so any page
+        is read back with one seek and one decompression.
+        :param folder: the folder holding pages.bin, index.jsonl and the optional trained dictionaries
+                       pages.<id>.dict, dictionary.txt names the one new pages are compressed with
+        :param level: the compression level
+        """
+        self.folder = folder
+        self.level = level
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.__data_path = os.path.join(folder, 'pages.bin')
+        self.__index_path = os.path.join(folder, 'index.jsonl')
+        self.__current_path = os.path.join(folder, 'dictionary.txt')
+        self.index = {}         # key -> (offset, length, codec, dictionary id), the last entry of a key wins
+        if os.path.exists(self.__index_path):
+            with open(self.__index_path, encoding='utf-8') as file:
+                for line in file:
+                    entry = json.loads(line)
+                    self.index[entry['key']] = (entry['offset'], entry['length'], entry['codec'],
+                                                entry.get('dictionary'))
+        # every dictionary is kept, so the pages compressed before a new training can still be read
+        self.__dictionaries = {}    # dictionary id -> ZstdCompressionDict
+        self.__dictionary_id = None
+        self.__dictionary = None
+        if zstandard is not None:
+            if os.path.exists(self.__current_path):
+                with open(self.__current_path, encoding='utf-8') as file:
+                    self.__dictionary_id = file.read().strip()
+                self.__dictionary = self.__load_dictionary(self.__dictionary_id)
+        self.__reader = None
+        # put() and get() are called from the threads of the spider's crawler
+        self.__lock = threading.Lock()
+
+    def __dictionary_path(self, dictionary_id):
+        return os.path.join(self.folder, 'pages.%s.dict' % dictionary_id)
+
+    def __load_dictionary(self, dictionary_id):
+        if dictionary_id not in self.__dictionaries:
+            with open(self.__dictionary_path(dictionary_id), 'rb') as file:
+                self.__dictionaries[dictionary_id] = zstandard.ZstdCompressionDict(file.read())
+        return self.__dictionaries[dictionary_id]
+
+    def train_dictionary(self, samples, dict_size=112640):
+        """
+        Train a zstd dictionary on sample pages. Pages of one site share most of their markup, so a dictionary
+        makes each page compress several times smaller. New pages are compressed with the new dictionary, the
+        pages written before keep the codec and dictionary they were written with.
+        :param samples: list of page texts
+        :param dict_size: the size of the dictionary in bytes
+        :return: the id of the dictionary
+        """
+        if zstandard is None:
+            raise ImportError('zstandard is required to train a dictionary, please pip install zstandard')
+        dictionary = zstandard.train_dictionary(dict_size, [sample.encode('utf-8') for sample in samples])
+        dictionary_id = hashlib.sha256(dictionary.as_bytes()).hexdigest()[:16]
+        with open(self.__dictionary_path(dictionary_id), 'wb') as file:
+            file.write(dictionary.as_bytes())
+        temporary_path = self.__current_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            file.write(dictionary_id)
+        os.replace(temporary_path, self.__current_path)
+        with self.__lock:
+            self.__dictionaries[dictionary_id] = dictionary
+            self.__dictionary_id = dictionary_id
+            self.__dictionary = dictionary
+        return dictionary_id
+
+    def __compress(self, data):
+        if zstandard is None:
+            return zlib.compress(data, min(self.level, 9)), 'zlib', None
+        dictionary, dictionary_id = self.__dictionary, self.__dictionary_id
+        if dictionary is not None:
+            compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+            return compressor.compress(data), 'zstd-dict', dictionary_id
+        return zstandard.ZstdCompressor(level=self.level).compress(data), 'zstd', None
+
+    def __decompress(self, data, codec, dictionary_id):
+        if codec == 'zlib':
+            return zlib.decompress(data)
+        if zstandard is None:
+            raise ImportError('zstandard is required to read this page, please pip install zstandard')
+        if codec == 'zstd-dict':
+            return zstandard.ZstdDecompressor(dict_data=self.__load_dictionary(dictionary_id)).decompress(data)
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    def put(self, key, text):
+        """
+        Compress and append one page.
+        :param key: the page's url
+        :param text: the page's html
+        :return:
+        """
+        data, codec, dictionary_id = self.__compress(text.encode('utf-8'))
+        entry = {'key': key, 'offset': None, 'length': len(data), 'codec': codec}
+        if dictionary_id is not None:
+            entry['dictionary'] = dictionary_id
+        with self.__lock:
+            with open(self.__data_path, 'ab') as file:
+                file.seek(0, os.SEEK_END)
+                offset = file.tell()
+                file.write(data)
+            entry['offset'] = offset
+            with open(self.__index_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry) + '\n')
+            self.index[key] = (offset, len(data), codec, dictionary_id)
+
+    def get(self, key):
+        """
+        Read one page back.
+        :param key: the page's url
+        :return: the page's html
+        """
+        with self.__lock:
+            offset, length, codec, dictionary_id = self.index[key]
+            if self.__reader is None:
+                self.__reader = open(self.__data_path, 'rb')
+            self.__reader.seek(offset)
+            data = self.__reader.read(length)
+        return self.__decompress(data, codec, dictionary_id).decode('utf-8')
+
+    def keys(self):
+        """
+        The keys of the archived pages, in the order they were first archived.
+        :return: list of str
+        """
+        return list(self.index.keys())
+
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        if self.__reader is not None:
+            self.__reader.close()
+            self.__reader = None
+
+    def reparse(self, parser, keys=None, processes=None, chunk_size=16):
+        """
+        Run a parser over archived pages in parallel, without any network access.
+        :param parser: a picklable function taking the html of a page
+        :param keys: the pages to parse, all pages in archive order if None
+        :param processes: the number of worker processes, os.cpu_count() if None
+        :param chunk_size: the number of pages sent to a worker at once
+        :return: list of (key, parser result), the result is the exception instance if the page failed to parse
+        """
+        if keys is None:
+            keys = self.keys()
+        chunks = [(self.folder, keys[i:i + chunk_size], parser) for i in range(0, len(keys), chunk_size)]
+        with Pool(processes) as pool:
+            results = pool.map(_reparse_chunk, chunks)
+        return [item for chunk in results for item in chunk]
@@ -0,0 +1,375 @@
+import io
+import os
+import zlib
+import struct
+import hashlib
+import unicodedata
+from PIL import Image as PILImage
+
+# A4 in points, like the pages borb creates
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 60
+LINE_HEIGHT = 1.2
+
+# the standard fonts every pdf reader has, so no font program is embedded at all
+FONTS = {'Helvetica': 'F1', 'Helvetica-Bold': 'F2'}
+
+# glyph widths (1/1000 of the font size) of the characters 32 to 126, from the Adobe font metrics
+__HELVETICA = [278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556,
+               556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556, 1015, 667, 667, 722, 722, 667, 611, 778,
+               722, 278, 500, 667, 556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278,
+               278, 278, 469, 556, 333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+               556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584]
+__HELVETICA_BOLD = [278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556,
+                    556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611, 975, 722, 722, 722, 722, 667, 611,
+                    778, 722, 278, 556, 722, 611, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611,
+                    333, 278, 333, 584, 556, 333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611,
+                    611, 611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584]
+WIDTHS = {'Helvetica': __HELVETICA, 'Helvetica-Bold': __HELVETICA_BOLD}
+
+
+def text_width(text, font='Helvetica', size=10):
+    """
+    The width of a line of text in points (characters outside of ASCII are counted with the width of a digit).
+    """
+    widths = WIDTHS[font]
+    return sum(widths[ord(c) - 32] if 32 <= ord(c) <= 126 else 556 for c in text) * size / 1000
+
+
+def wrap(text, width, font='Helvetica', size=10):
+    """
+    Split a text into the lines that fit into the width, at spaces.
+    :return: list of str
+    """
+    lines = []
+    for part in str(text).split('\n'):
+        line = ''
+        for word in part.split(' '):
+            candidate = word if not line else line + ' ' + word
+            if line and text_width(candidate, font, size) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    # the report strings end with a line break
+    while len(lines) > 1 and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+class UnsupportedTextError(ValueError):
+    """
+    A text has characters the standard fonts do not have.
+    """
+
+
+def to_win_ansi(text):
+    """
+    A text in the WinAnsi encoding of the fonts. Letters it does not have are written without their accents (like
+    "ő" as "o"), any other character it does not have raises an UnsupportedTextError instead of being replaced.
+    :return: bytes
+    """
+    text = str(text)
+    try:
+        return text.encode('cp1252')
+    except UnicodeEncodeError:
+        pass
+    data = b''
+    unsupported = []
+    for c in text:
+        try:
+            data += c.encode('cp1252')
+        except UnicodeEncodeError:
+            base = ''.join(part for part in unicodedata.normalize('NFKD', c) if not unicodedata.combining(part))
+            try:
+                data += base.encode('cp1252') if base else c.encode('cp1252')
+            except UnicodeEncodeError:
+                unsupported.append(c)
+    if unsupported:
+        raise UnsupportedTextError('the pdf fonts have no %s in "%s"' % (', '.join(sorted(set(unsupported))), text))
+    return data
+
+
+def _pdf_string(text):
+    """
+    A literal string in the WinAnsi encoding of the fonts, see to_win_ansi().
+    """
+    data = to_win_ansi(text)
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _to_jpeg(data, path):
+    """
+    Convert an image in any format Pillow reads to JPEG, transparent parts on white.
+    """
+    try:
+        image = PILImage.open(io.BytesIO(data))
+        image.load()
+    except OSError:
+        raise ValueError('%s is not an image that can be embedded' % path)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = PILImage.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def _jpeg_info(data):
+    """
+    (width, height, number of components) from the frame header of a JPEG file.
+    """
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xff:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7, 0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf):
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height, data[i + 9]
+        if marker == 0xff or marker == 0xd8 or 0xd0 <= marker <= 0xd7:
+            i += 1 if marker == 0xff else 2
+            continue
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    raise ValueError('the JPEG image has no frame header')
+
+
+class PageCanvas:
+    def __init__(self, width=PAGE_WIDTH, height=PAGE_HEIGHT, margin=MARGIN):
+        """
+        The content of one page, laid out top to bottom in a single column like borb's SingleColumnLayout.
+        Images and forms are referenced by the object numbers StreamingPdfWriter gave them.
+        """
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.y = height - margin
+        self.commands = []
+        self.xobjects = {}          # resource name -> object number
+
+    def __text(self, x, y, text, font, size):
+        self.commands.append(b'BT /%s %g Tf %.2f %.2f Td %s Tj ET'
+                             % (FONTS[font].encode(), size, x, y, _pdf_string(text)))
+
+    def paragraph(self, text, font='Helvetica', size=12, align='left', space_after=6):
+        """
+        Add a paragraph, wrapped into the column.
+        :param align: 'left' or 'center'
+        """
+        column = self.width - 2 * self.margin
+        for line in wrap(text, column, font, size):
+            self.y -= size * LINE_HEIGHT
+            x = self.margin
+            if align == 'center':
+                x += (column - text_width(line, font, size)) / 2
+            self.__text(x, self.y, line, font, size)
+        self.y -= space_after
+
+    def table(self, rows, column_weights=None, size=8, bold_first_row=False, bold_first_column=False, padding=5,
+              space_after=6):
+        """
+        Add a table with borders, the cells wrapped into their column.
+        :param rows: list of rows, every row a list of values
+        :param column_weights: the relative widths of the columns, equal widths if None
+        """
+        if not rows:
+            return
+        if column_weights is None:
+            column_weights = [1] * len(rows[0])
+        column = self.width - 2 * self.margin
+        widths = [column * weight / sum(column_weights) for weight in column_weights]
+        self.commands.append(b'0.5 w')
+        for r, row in enumerate(rows):
+            fonts = ['Helvetica-Bold' if (bold_first_row and r == 0) or (bold_first_column and c == 0)
+                     else 'Helvetica' for c in range(len(row))]
+            cells = [wrap(value, widths[c] - 2 * padding, fonts[c], size) for c, value in enumerate(row)]
+            row_height = max(len(lines) for lines in cells) * size * LINE_HEIGHT + 2 * padding
+            x = self.margin
+            for c, lines in enumerate(cells):
+                self.commands.append(b'%.2f %.2f %.2f %.2f re S' % (x, self.y - row_height, widths[c], row_height))
+                y = self.y - padding
+                for line in lines:
+                    y -= size * LINE_HEIGHT
+                    self.__text(x + padding, y + size * (LINE_HEIGHT - 1), line, fonts[c], size)
+                x += widths[c]
+            self.y -= row_height
+        self.y -= space_after
+
+    def image(self, object_number, width, height, space_after=6):
+        """
+        Add an image centered in the column.
+        :param object_number: the result of StreamingPdfWriter.add_image()
+        """
+        name = 'Im%d' % object_number
+        self.xobjects[name] = object_number
+        self.y -= height
+        x = (self.width - width) / 2
+        self.commands.append(b'q %.2f 0 0 %.2f %.2f %.2f cm /%s Do Q' % (width, height, x, self.y, name.encode()))
+        self.y -= space_after
+
+    def form(self, object_number):
+        """
+        Draw a whole page form, see StreamingPdfWriter.add_form().
+        """
+        name = 'Fm%d' % object_number
+        self.xobjects[name] = object_number
+        self.commands.append(b'q /%s Do Q' % name.encode())
+
+    def content(self):
+        return b'\n'.join(self.commands)
+
+
+class StreamingPdfWriter:
+    def __init__(self, path):
+        """
+        Write a pdf incrementally: every page, image and form is written to the file as soon as it is added, so
+        memory does not grow with the number of pages (only the object offsets, the page numbers and the bookmarks
+        are kept until close()). The fonts are the standard Helvetica fonts, referenced by one shared resource
+        dictionary, and images and forms are embedded once per distinct content.
+        :param path: the pdf file, it only appears there once close() has written the cross-reference table
+        """
+        self.path = path
+        self.__temporary_path = '%s.%d.tmp' % (path, os.getpid())
+        self.__file = open(self.__temporary_path, 'wb')
+        self.__offsets = {}
+        self.__next_number = 1
+        self.__pages = []
+        self.__bookmarks = []        # (title, page object number)
+        self.__embedded = {}         # content hash -> object number
+        self.__catalog = self.__reserve()
+        self.__page_tree = self.__reserve()
+        self.__outlines = self.__reserve()
+        self.__file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        font_numbers = []
+        for font in FONTS:
+            number = self.__reserve()
+            self.__write_object(number, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                                % font.encode())
+            font_numbers.append(number)
+        self.__fonts = self.__reserve()
+        self.__write_object(self.__fonts, b'<< %s >>' % b' '.join(
+            b'/%s %d 0 R' % (name.encode(), number) for name, number in zip(FONTS.values(), font_numbers)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.__file.close()
+            os.remove(self.__temporary_path)
+
+    def __reserve(self):
+        number = self.__next_number
+        self.__next_number += 1
+        return number
+
+    def __write_object(self, number, body):
+        self.__offsets[number] = self.__file.tell()
+        self.__file.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def __write_stream(self, number, dictionary, data):
+        self.__write_object(number, b'<< %s /Length %d >>\nstream\n' % (dictionary, len(data)) + data + b'\nendstream')
+
+    def __resources(self, canvas):
+        xobjects = b' '.join(b'/%s %d 0 R' % (name.encode(), number) for name, number in canvas.xobjects.items())
+        return b'<< /Font %d 0 R /XObject << %s >> >>' % (self.__fonts, xobjects)
+
+    def add_image(self, path):
+        """
+        Embed an image, once per distinct file content. JPEG files are embedded as they are, the other formats Pillow
+        reads are converted to JPEG first, and a file that is no image raises a ValueError.
+        :return: the object number of the image, for PageCanvas.image()
+        """
+        with open(path, 'rb') as file:
+            data = file.read()
+        digest = 'image ' + hashlib.sha256(data).hexdigest()
+        if digest not in self.__embedded:
+            if data[:2] != b'\xff\xd8':
+                data = _to_jpeg(data, path)
+            width, height, components = _jpeg_info(data)
+
+            color_space = {1: b'/DeviceGray', 3: b'/DeviceRGB', 4: b'/DeviceCMYK'}[components]
+            number = self.__reserve()
+            self.__write_stream(number, b'/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s '
+                                        b'/BitsPerComponent 8 /Filter /DCTDecode' % (width, height, color_space), data)
+            self.__embedded[digest] = number
+        return self.__embedded[digest]
+
+    def add_form(self, canvas):
+        """
+        Embed the content of a canvas as a whole page form, once per distinct content, so pages that are the same
+        in several reports (like the table of a genre) are stored once and drawn with PageCanvas.form().
+        :return: the object number of the form
+        """
+        content = canvas.content()
+        resources = self.__resources(canvas)
+        digest = 'form ' + hashlib.sha256(resources + b'\n' + content).hexdigest()
+        if digest not in self.__embedded:
+            number = self.__reserve()
+            self.__write_stream(number, b'/Type /XObject /Subtype /Form /BBox [0 0 %d %d] /Resources %s '
+                                        b'/Filter /FlateDecode' % (canvas.width, canvas.height, resources),
+                                zlib.compress(content))
+            self.__embedded[digest] = number
+        return self.__embedded[digest]
+
+    def add_page(self, canvas):
+        """
+        Write a page.
+        :return: the object number of the page, for add_bookmark()
+        """
+        contents = self.__reserve()
+        self.__write_stream(contents, b'/Filter /FlateDecode', zlib.compress(canvas.content()))
+        number = self.__reserve()
+        self.__write_object(number, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s '
+                                    b'/Contents %d 0 R >>' % (self.__page_tree, canvas.width, canvas.height,
+                                                              self.__resources(canvas), contents))
+        self.__pages.append(number)
+        return number
+
+    def add_bookmark(self, title, page):
+        """
+        Add an entry to the outline of the document.
+        :param page: the object number of the page it opens
+        """
+        self.__bookmarks.append((title, page))
+
+    def close(self):
+        items = [self.__reserve() for _ in self.__bookmarks]
+        for i, (title, page) in enumerate(self.__bookmarks):
+            links = b''
+            if i > 0:
+                links += b' /Prev %d 0 R' % items[i - 1]
+            if i < len(items) - 1:
+                links += b' /Next %d 0 R' % items[i + 1]
+            # text strings outside of the fonts are written as UTF-16
+            title = b'<FEFF%s>' % str(title).encode('utf-16-be').hex().upper().encode()
+            self.__write_object(items[i], b'<< /Title %s /Parent %d 0 R%s /Dest [%d 0 R /Fit] >>'
+                                % (title, self.__outlines, links, page))
+        if items:
+            self.__write_object(self.__outlines, b'<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>'
+                                % (items[0], items[-1], len(items)))
+        else:
+            self.__write_object(self.__outlines, b'<< /Type /Outlines /Count 0 >>')
+        self.__write_object(self.__page_tree, b'<< /Type /Pages /Kids [%s] /Count %d >>'
+                            % (b' '.join(b'%d 0 R' % page for page in self.__pages), len(self.__pages)))
+        self.__write_object(self.__catalog, b'<< /Type /Catalog /Pages %d 0 R /Outlines %d 0 R /PageMode /UseOutlines >>'
+                            % (self.__page_tree, self.__outlines))
+
+        xref = self.__file.tell()
+        size = self.__next_number
+        self.__file.write(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+        for number in range(1, size):
+            self.__file.write(b'%010d 00000 n \n' % self.__offsets[number])
+        self.__file.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, self.__catalog, xref))
+        self.__file.close()
+        # readers never see a half written file
+        os.replace(self.__temporary_path, self.path)
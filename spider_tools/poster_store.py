@@ -0,0 +1,110 @@
+import os
+import io
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+from PIL import Image as PILImage
+
+# the size the thumbnails are stored at, twice the size output_pdf() draws them at (100 x 148 pt)
+THUMBNAIL_SIZE = (200, 296)
+
+
+class PosterStore:
+    def __init__(self, folder='./movie_poster', thumbnail_size=THUMBNAIL_SIZE):
+        """
+        Local store of movie posters. Images are saved once per content hash (sha256), already downscaled to the
+        thumbnail size, and index.json maps every title to the hash of its poster.
+        :param folder: the folder of the store
+        :param thumbnail_size: (width, height) in pixels the posters are downscaled to
+        """
+        self.folder = folder
+        self.thumbnail_size = thumbnail_size
+        self.__index_path = os.path.join(folder, 'index.json')
+        self.index = {}         # title -> content hash
+        if os.path.exists(self.__index_path):
+            with open(self.__index_path, encoding='utf-8') as file:
+                self.index = json.load(file)
+
+    def __image_path(self, digest):
+        return os.path.join(self.folder, '%s.jpg' % digest)
+
+    def thumbnail_path(self, title):
+        """
+        The path of the title's cached thumbnail.
+        :param title: the movie name
+        :return: str, or None if no poster was fetched for the title
+        """
+        digest = self.index.get(title)
+        if digest is None or not os.path.exists(self.__image_path(digest)):
+            return None
+        return self.__image_path(digest)
+
+    def __thumbnail(self, content):
+        # every poster is stored as a JPEG thumbnail whatever its format, the pdf writers embed it as it is
+        image = PILImage.open(io.BytesIO(content))
+        image = image.convert('RGB')
+        image.thumbnail(self.thumbnail_size)
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=85)
+        return output.getvalue()
+
+    def add(self, content):
+        """
+        Save one downloaded image, unless an image with the same content is already in the store.
+        :param content: the bytes of the image
+        :return: the content hash of the image
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.__image_path(digest)
+        if not os.path.exists(path):
+            thumbnail = self.__thumbnail(content)
+            # write to a temporary file first, so a concurrent reader never sees a partial image
+            temporary_path = '%s.%d.tmp' % (path, threading.get_ident())
+            with open(temporary_path, 'wb') as file:
+                file.write(thumbnail)
+            os.replace(temporary_path, path)
+        return digest
+
+    def __fetch(self, session, url, timeout):
+        resp = session.get(url, timeout=timeout)
+        resp.raise_for_status()
+        return self.add(resp.content)
+
+    def fetch_all(self, poster_urls, max_workers=8, timeout=10, session=None):
+        """
+        Download the posters concurrently with a bounded pool of threads. A url shared by several titles is only
+        downloaded once, and titles already in the store are skipped.
+        :param poster_urls: dict of title -> poster url
+        :param max_workers: the maximum number of concurrent downloads
+        :param timeout: the timeout of one download in seconds
+        :param session: requests.Session to use, a new one if None
+        :return: dict of title -> error for the posters that could not be fetched
+        """
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        if session is None:
+            session = requests.Session()
+        urls = {}
+        for title, url in poster_urls.items():
+            if url and self.thumbnail_path(title) is None:
+                urls.setdefault(url, []).append(title)
+
+        failed = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {url: executor.submit(self.__fetch, session, url, timeout) for url in urls}
+            for url, future in futures.items():
+                try:
+                    digest = future.result()
+                except (requests.RequestException, OSError) as error:
+                    for title in urls[url]:
+                        failed[title] = error
+                    continue
+                for title in urls[url]:
+                    self.index[title] = digest
+
+        with open(self.__index_path, 'w', encoding='utf-8') as file:
+            json.dump(self.index, file, ensure_ascii=False, indent=1)
+        return failed
@@ -0,0 +1,183 @@
+import math
+import random
+from bisect import bisect_left, bisect_right
+
+
+class KLLSketch:
+    def __init__(self, k=200, c=2 / 3, seed=None):
+        """
+        Mergeable KLL quantile sketch (Karnin, Lang and Liberty). It keeps a bounded number of samples no matter
+        how many values are added, so quantiles and ranks can be answered without sorting the full column.
+        While fewer than k values have been added nothing is compacted and every answer is exact.
+        The normalized rank error is O(1/k); with the default k=200 it stays around 1-2% of the number of values.
+        :param k: the accuracy parameter, the size of the largest compactor
+        :param c: the shrink factor of the lower compactors, must be in (0.5, 1)
+        :param seed: seed of the random generator used by the compactions, for reproducible results
+        """
+        if k < 2:
+            raise ValueError('k must be at least 2')
+        if not 0.5 < c < 1:
+            raise ValueError('c must in 0.5-1')
+        self.k = k
+        self.c = c
+        self.count = 0                      # the number of values added to the sketch
+        self.__random = random.Random(seed)
+        self.__compactors = [[]]
+        self.__size = 0                     # the number of samples currently kept
+        self.__max_size = 0
+        self.__sorted_items = None          # cache for the queries, cleared by update() and merge()
+        self.__cumulative_weights = None
+        self.__update_max_size()
+
+    def __capacity(self, height):
+        depth = len(self.__compactors) - height - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+
+    def __update_max_size(self):
+        self.__max_size = sum(self.__capacity(h) for h in range(len(self.__compactors)))
+
+    def __compact(self, height):
+        """
+        Sort the compactor, keep every other sample (starting at a random offset) and promote them one level up,
+        where each of them counts twice.
+        """
+        compactor = self.__compactors[height]
+        if height + 1 >= len(self.__compactors):
+            self.__compactors.append([])
+            self.__update_max_size()
+        compactor.sort()
+        offset = self.__random.randint(0, 1)
+        self.__compactors[height + 1].extend(compactor[offset::2])
+        compactor.clear()
+
+    def __compress(self):
+        while self.__size >= self.__max_size:
+            for h in range(len(self.__compactors)):
+                if len(self.__compactors[h]) >= self.__capacity(h):
+                    self.__compact(h)
+                    break
+            self.__size = sum(len(compactor) for compactor in self.__compactors)
+
+    def update(self, value):
+        """
+        Add one value to the sketch.
+        :param value: a number
+        :return:
+        """
+        self.__compactors[0].append(value)
+        self.__size += 1
+        self.count += 1
+        self.__sorted_items = None
+        if self.__size >= self.__max_size:
+            self.__compress()
+
+    def extend(self, values):
+        """
+        Add every value of an iterable to the sketch.
+        :param values: iterable of numbers
+        :return:
+        """
+        for value in values:
+            self.update(value)
+
+    def merge(self, other):
+        """
+        Merge another sketch into this one. The result answers queries over the values of both sketches.
+        :param other: KLLSketch
+        :return: self
+        """
+        while len(self.__compactors) < len(other.__compactors):
+            self.__compactors.append([])
+        self.__update_max_size()
+        for h in range(len(other.__compactors)):
+            self.__compactors[h].extend(other.__compactors[h])
+        self.count += other.count
+        self.__size = sum(len(compactor) for compactor in self.__compactors)
+        self.__sorted_items = None
+        self.__compress()
+        return self
+
+    def is_exact(self):
+        """
+        Whether no compaction has happened yet, i.e. every added value is still kept and answers are exact.
+        """
+        return len(self.__compactors) == 1
+
+    def __prepare(self):
+        if self.__sorted_items is not None:
+            return
+        weighted = []
+        for h, compactor in enumerate(self.__compactors):
+            weight = 2 ** h
+            weighted.extend((value, weight) for value in compactor)
+        weighted.sort(key=lambda item: item[0])
+        self.__sorted_items = [item[0] for item in weighted]
+        self.__cumulative_weights = []
+        total = 0
+        for item in weighted:
+            total += item[1]
+            self.__cumulative_weights.append(total)
+
+    def __total_weight(self):
+        return self.__cumulative_weights[-1] if self.__cumulative_weights else 0
+
+    def quantile(self, q):
+        """
+        The value below which a fraction q of the added values lie.
+        :param q: the quantile, 0<=q<=1
+        :return: value, or None if the sketch is empty
+        """
+        if not 0 <= q <= 1:
+            raise ValueError('q must in 0-1')
+        self.__prepare()
+        if not self.__sorted_items:
+            return None
+        target = q * self.__total_weight()
+        index = bisect_right(self.__cumulative_weights, target)
+        return self.__sorted_items[min(index, len(self.__sorted_items) - 1)]
+
+    def rank(self, value):
+        """
+        Estimated number of added values strictly less than value.
+        It matches sorted(values).index(value) when the sketch is exact.
+        :param value: a number
+        :return: int
+        """
+        self.__prepare()
+        index = bisect_left(self.__sorted_items, value)
+        if index == 0:
+            return 0
+        weight = self.__cumulative_weights[index - 1]
+        return int(round(weight * self.count / self.__total_weight()))
+
+    def value_at(self, index):
+        """
+        Estimated value at an index of the sorted added values, negative indexes count from the end.
+        It matches sorted(values)[index] when the sketch is exact.
+        :param index: int, -count <= index < count
+        :return: value, or None if the sketch is empty
+        """
+        self.__prepare()
+        if not self.__sorted_items:
+            return None
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('index out of range')
+        target = index * self.__total_weight() / self.count
+        position = bisect_right(self.__cumulative_weights, target)
+        return self.__sorted_items[min(position, len(self.__sorted_items) - 1)]
+
+    def percentile_rank(self, value):
+        """
+
+        Estimated percentage of added values strictly less than value.
+        :param value: a number
+        :return: float in 0-100
+        """
+        if self.count == 0:
+            return 0.0
+        return 100.0 * self.rank(value) / self.count
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,147 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    from spider_tools.currency import to_dollar, to_dollar_by_year, release_year
+    from spider_tools.snapshot_store import parse_rating_numbers
+except ImportError:
+    from currency import to_dollar, to_dollar_by_year, release_year
+    from snapshot_store import parse_rating_numbers
+
+NUMERIC_COLUMNS = ('Year', 'Time', 'Score', 'Votes', 'Budget', 'Gross worldwide')
+STRING_COLUMNS = ('Title', 'Film rating', 'Genre', 'Language', 'Keywords', 'Country')
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError('pyarrow is required for the shared dataset, please pip install pyarrow')
+
+
+def normalize(data, currency_exchange_rate=None, exchange_rates=None, cpi=None, base_year=None):
+    """
+    Normalize the raw data of IMDb.xls into typed columns: the release year as int, the number of votes as int and
+    budget and gross worldwide converted to US dollars.
+    :param data: pd.DataFrame read from IMDb.xls
+    :param currency_exchange_rate: dict of currency symbol -> rate, currency.CURRENCY_EXCHANGE_RATE if None
+    :param exchange_rates: a table of historical exchange rates (see currency.load_exchange_rates()), the amounts are
+                           then converted at the rate of their release year (NaN for unknown currencies)
+    :param cpi: with exchange_rates, adjust the amounts for inflation to the dollars of base_year, see
+                currency.to_dollar_by_year()
+    :param base_year: the year of the dollars after the inflation adjustment
+    :return: pd.DataFrame
+    """
+    year = release_year(data['Year'])
+    if exchange_rates is None:
+        budget = to_dollar(data['Budget'], currency_exchange_rate)
+        gross_worldwide = to_dollar(data['Gross worldwide'], currency_exchange_rate)
+    else:
+        budget = to_dollar_by_year(data['Budget'], year, exchange_rates, cpi, base_year)
+        gross_worldwide = to_dollar_by_year(data['Gross worldwide'], year, exchange_rates, cpi, base_year)
+    normalized = pd.DataFrame({
+        'Title': data['Title'].astype(str),
+        'Year': year,
+        'Film rating': data['Film rating'].fillna('').astype(str),
+        'Time': pd.to_numeric(data['Time'], errors='coerce').fillna(0).astype(np.int32),
+        'Score': pd.to_numeric(data['Score'], errors='coerce').astype(np.float64),
+        'Votes': data['Rating Numbers'].map(parse_rating_numbers).astype(np.int64),
+        'Genre': data['Genre'].fillna('').astype(str),
+        'Language': data['Language'].fillna('').astype(str),
+        'Keywords': data['Keywords'].fillna('').astype(str),
+        'Budget': budget.astype(np.float64),
+        'Gross worldwide': gross_worldwide.astype(np.float64),
+        'Country': data['Country'].fillna('').astype(str),
+    })
+    return normalized
+
+
+def default_path(name='imdb_dataset.arrow'):
+    """
+    The path datasets are published to: /dev/shm (memory backed) when it exists, the temporary folder otherwise.
+    """
+    folder = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(folder, name)
+
+
+def publish(data, path=None):
+    """
+    Write a normalized dataset once as an Arrow IPC file, as a single record batch so every column is contiguous.
+    Worker processes then attach to it with SharedDataset(path) instead of receiving a pickled copy.
+    :param data: pd.DataFrame, usually the result of normalize()
+    :param path: the file to write, default_path() if None
+    :return: the path of the file
+    """
+    _require_pyarrow()
+    if path is None:
+        path = default_path()
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    # from_pandas turns NaN (e.g. an amount in an unknown currency) into null, and a column with nulls cannot be
+    # viewed without copying by numeric(), so the float columns keep their NaN
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type) and table.column(i).null_count:
+            table = table.set_column(i, field, pa.array(data[field.name].to_numpy(), from_pandas=False))
+    table = table.combine_chunks()
+
+
+    temporary_path = '%s.%d.tmp' % (path, os.getpid())
+    with pa.OSFile(temporary_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(len(table), 1))
+    # readers never see a half written file
+    os.replace(temporary_path, path)
+    return path
+
+
+class SharedDataset:
+    def __init__(self, path):
+        """
+        Attach to a dataset published with publish(). The file is memory mapped, so every process attached to it
+        shares the same physical pages and attaching costs no copy of the data.
+        :param path: the path of the Arrow IPC file
+        """
+        _require_pyarrow()
+        self.path = path
+        self.__source = pa.memory_map(path, 'r')
+        self.table = pa.ipc.open_file(self.__source).read_all()
+
+    def __len__(self):
+        return self.table.num_rows
+
+    @property
+    def columns(self):
+        return self.table.column_names
+
+    def numeric(self, name):
+        """
+        A read only NumPy view of a numeric column, backed directly by the memory mapped file.
+        :param name: the column name
+        :return: np.ndarray
+        """
+        column = self.table.column(name)
+        if column.num_chunks == 0:
+            return np.zeros(0, dtype=column.type.to_pandas_dtype())
+        return column.chunk(0).to_numpy(zero_copy_only=True)
+
+    def strings(self, name):
+        """
+        A string column as a Python list (strings cannot be viewed without copying).
+        :param name: the column name
+        :return: list of str
+        """
+        return self.table.column(name).to_pylist()
+
+    def to_pandas(self):
+        """
+        Copy the whole dataset into a pd.DataFrame.
+        """
+        return self.table.to_pandas()
+
+    def close(self):
+        self.table = None
+        self.__source.close()
@@ -0,0 +1,291 @@
+import os
+import re
+import json
+import datetime
+import numpy as np
+
+# one record per changed row of a snapshot; rank 0 means the title dropped off the chart
+RECORD_DTYPE = np.dtype([('day', '<i4'), ('title_id', '<i4'), ('rank', '<i2'), ('score', '<f4'), ('votes', '<i8')])
+DAY_DTYPE = np.dtype('<i4')
+
+
+def parse_rating_numbers(rating_numbers):
+    """
+    Convert the 'Rating Numbers' strings of IMDb (e.g. '2.7M', '92K', '950') to an integer number of votes.
+    :param rating_numbers: str
+    :return: int
+    """
+    find = re.findall(r'(\d+\.?\d*)\s*([KM]?)', str(rating_numbers))
+    if not find:
+        return 0
+    number = float(find[0][0])
+    if find[0][1] == 'K':
+        number *= 1000
+    elif find[0][1] == 'M':
+        number *= 1000000
+    return int(number)
+
+
+def title_key(url):
+    """
+    Get the IMDb title id (e.g. 'tt0111161') from a title url, which is stable across renames of the title.
+    :param url: the movie's url
+    :return: str, or the url itself if it contains no title id
+    """
+    find = re.findall(r'(tt\d+)', url)
+    return find[0] if find else url
+
+
+def is_title_id(key):
+    """
+    Whether a key is an IMDb title id like the ones title_key() gives, rather than a movie name.
+    """
+    return re.fullmatch(r'tt\d+', str(key)) is not None
+
+
+class SnapshotStore:
+    def __init__(self, folder='./snapshots'):
+        """
+        Compact columnar store of dated chart snapshots.
+        Every crawl appends the rows that changed since the previous snapshot (delta encoding) to an append-only
+        binary log of fixed-width records, with titles dictionary-encoded as small integer ids.
+        The log is read with one np.fromfile call and every query is a vectorized numpy operation on it.
+        The titles of a store are keyed either by their IMDb title id (the spider's snapshots) or by their movie
+        name (snapshots of an excel without urls), never both, so a title is never counted twice.
+        :param folder: the folder holding titles.json, days.bin and records.bin
+        """
+        self.folder = folder
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.__titles_path = os.path.join(folder, 'titles.json')
+        self.__days_path = os.path.join(folder, 'days.bin')
+        self.__records_path = os.path.join(folder, 'records.bin')
+
+        self.keys = []          # title id -> key (IMDb title id)
+        self.titles = []        # title id -> title text
+        self.__key_index = {}
+        self.__title_index = {}
+        if os.path.exists(self.__titles_path):
+            with open(self.__titles_path, encoding='utf-8') as file:
+                for item in json.load(file):
+                    self.__add_title(item['key'], item['title'])
+        self.days = self.__read(self.__days_path, DAY_DTYPE)
+        self.records = self.__read(self.__records_path, RECORD_DTYPE)
+
+    @staticmethod
+    def __read(path, dtype):
+        if os.path.exists(path):
+            return np.fromfile(path, dtype=dtype)
+        return np.zeros(0, dtype=dtype)
+
+    @staticmethod
+    def __to_day(date):
+        if isinstance(date, str):
+            date = datetime.date.fromisoformat(date)
+        return date.toordinal()
+
+    @staticmethod
+    def __to_date(day):
+        return datetime.date.fromordinal(int(day))
+
+    def __add_title(self, key, title):
+        title_id = len(self.keys)
+        self.keys.append(key)
+        self.titles.append(title)
+        self.__key_index[key] = title_id
+        self.__title_index[title] = title_id
+        return title_id
+
+    def title_id(self, key_or_title):
+        """
+        Look up the dictionary id of a title by its key or its title text.
+        :param key_or_title: IMDb title id or movie name
+        :return: int
+        """
+        if key_or_title in self.__key_index:
+            return self.__key_index[key_or_title]
+        if key_or_title in self.__title_index:
+            return self.__title_index[key_or_title]
+        raise KeyError('Title "%s" is not in the snapshot store' % key_or_title)
+
+    def __state(self, day):
+        """
+        The last record of every title at or before day, as a structured array sorted by title id.
+        """
+        records = self.records[:np.searchsorted(self.records['day'], day, side='right')]
+        if len(records) == 0:
+            return records
+        # records are appended in day order, so the last occurrence of each title id is its current state
+        reversed_ids = records['title_id'][::-1]
+        _, first = np.unique(reversed_ids, return_index=True)
+        return records[len(records) - 1 - first]
+
+    def add_snapshot(self, date, movie_list, ranks=None):
+        """
+        Append the snapshot of one crawl. Only the rows that differ from the previous snapshot are written.
+        A snapshot of the same date as the last one replaces it, e.g. when the spider runs twice on one day.
+        :param date: datetime.date or 'YYYY-MM-DD', must not be earlier than the last stored snapshot
+        :param movie_list: list of (key, title, score, rating numbers) in chart order
+        :param ranks: the chart position of every movie of movie_list, its position in the list if None
+                      (give them when movies that failed to crawl are left out of the list)
+        :return: the number of records written
+        """
+        if ranks is None:
+            ranks = range(1, len(movie_list) + 1)
+        elif len(ranks) != len(movie_list):
+            raise ValueError('ranks must have one chart position per movie')
+        new_keys = [key for key, _, _, _ in movie_list if key not in self.__key_index]
+        if len({is_title_id(key) for key in self.keys[:1] + new_keys}) > 1:
+            raise ValueError('the titles of a snapshot store are keyed either by IMDb title ids or by movie names, '
+                             'not both')
+        day = self.__to_day(date)
+        if len(self.days) and day < self.days[-1]:
+            raise ValueError('snapshot date must not be earlier than %s' % self.__to_date(self.days[-1]))
+        if len(self.days) and day == self.days[-1]:
+            self.__remove_last_snapshot()
+
+        new_titles = False
+        rows = np.zeros(len(movie_list), dtype=RECORD_DTYPE)
+        for i, ((key, title, score, rating_numbers), rank) in enumerate(zip(movie_list, ranks)):
+            if key not in self.__key_index:
+                self.__add_title(key, title)
+                new_titles = True
+            rows[i] = (day, self.__key_index[key], rank, float(score), parse_rating_numbers(rating_numbers))
+
+        previous = self.__state(day)
+        previous = previous[previous['rank'] > 0]
+        changed = np.ones(len(rows), dtype=bool)
+        if len(previous):
+            position = np.searchsorted(previous['title_id'], rows['title_id'])
+            position = np.minimum(position, len(previous) - 1)
+            matched = previous[position]
+            known = matched['title_id'] == rows['title_id']
+            same = known & (matched['rank'] == rows['rank']) & (matched['score'] == rows['score']) & \
+                (matched['votes'] == rows['votes'])
+            changed = ~same
+            # titles that left the chart get a tombstone record
+            dropped = previous[~np.isin(previous['title_id'], rows['title_id'])].copy()
+            dropped['day'] = day
+            dropped['rank'] = 0
+        else:
+            dropped = np.zeros(0, dtype=RECORD_DTYPE)
+        delta = np.concatenate([rows[changed], dropped])
+
+        if new_titles:
+            with open(self.__titles_path, 'w', encoding='utf-8') as file:
+                json.dump([{'key': k, 'title': t} for k, t in zip(self.keys, self.titles)], file, ensure_ascii=False)
+        with open(self.__records_path, 'ab') as file:
+            file.write(delta.tobytes())
+        with open(self.__days_path, 'ab') as file:
+            file.write(np.array([day], dtype=DAY_DTYPE).tobytes())
+        self.records = np.concatenate([self.records, delta])
+        self.days = np.append(self.days, np.array([day], dtype=DAY_DTYPE))
+        return len(delta)
+
+    def __remove_last_snapshot(self):
+        """
+        Cut the records and the day of the last snapshot off the end of the logs.
+        """
+        keep = int(np.searchsorted(self.records['day'], self.days[-1], side='left'))
+        with open(self.__records_path, 'r+b') as file:
+            file.truncate(keep * RECORD_DTYPE.itemsize)
+        with open(self.__days_path, 'r+b') as file:
+            file.truncate((len(self.days) - 1) * DAY_DTYPE.itemsize)
+        self.records = self.records[:keep]
+        self.days = self.days[:-1]
+
+    def add_dataframe(self, date, dataframe):
+        """
+        Append a snapshot from a DataFrame read from IMDb.xls, using the row order as the rank. The key of a title is
+        the IMDb title id of its url like in the spider's snapshots when the DataFrame has a URL column, otherwise the
+        key the store already has for the title, and its name for a title new to the store.
+        :param date: datetime.date or 'YYYY-MM-DD'
+        :param dataframe: pd.DataFrame
+        :return: the number of records written
+        """
+        movie_list = []
+        for _, row in dataframe.iterrows():
+            if 'URL' in dataframe.columns:
+                key = title_key(row['URL'])
+            elif row['Title'] in self.__title_index:
+                key = self.keys[self.__title_index[row['Title']]]
+            else:
+                key = row['Title']
+            movie_list.append((key, row['Title'], row['Score'], row['Rating Numbers']))
+        return self.add_snapshot(date, movie_list)
+
+    def snapshot(self, date):
+        """
+        The chart as it was on date (the latest snapshot at or before it).
+        :param date: datetime.date or 'YYYY-MM-DD'
+        :return: list of (rank, title, score, votes) in chart order
+        """
+        state = self.__state(self.__to_day(date))
+        state = state[state['rank'] > 0]
+        state = state[np.argsort(state['rank'], kind='stable')]
+        return [(int(r['rank']), self.titles[r['title_id']], round(float(r['score']), 1), int(r['votes'])) for r in state]
+
+    def __trajectory(self, key_or_title, field):
+        title_id = self.title_id(key_or_title)
+        records = self.records[self.records['title_id'] == title_id]
+        # forward fill the sparse records onto every snapshot day
+        position = np.searchsorted(records['day'], self.days, side='right') - 1
+        present = position >= 0
+        values = np.where(present, records[field][np.maximum(position, 0)], 0)
+        return self.days[present], values[present]
+
+    def rank_trajectory(self, key_or_title):
+        """
+        The rank of a title on every snapshot date, 0 when it was not on the chart.
+        :param key_or_title: IMDb title id or movie name
+        :return: list of (date, rank)
+        """
+        days, ranks = self.__trajectory(key_or_title, 'rank')
+        return [(self.__to_date(d), int(r)) for d, r in zip(days, ranks)]
+
+    def score_trajectory(self, key_or_title):
+        """
+        The score of a title on every snapshot date.
+        :param key_or_title: IMDb title id or movie name
+        :return: list of (date, score)
+        """
+        days, scores = self.__trajectory(key_or_title, 'score')
+        return [(self.__to_date(d), round(float(s), 1)) for d, s in zip(days, scores)]
+
+    def biggest_movers(self, date1, date2, number=10):
+        """
+        The titles whose rank changed the most between two dates. Titles not on the chart at both dates are ignored.
+        :param date1: the earlier date
+        :param date2: the later date
+        :param number: how many titles to return
+        :return: list of (title, rank at date1, rank at date2, places gained), biggest absolute move first
+        """
+        before = self.__state(self.__to_day(date1))
+        after = self.__state(self.__to_day(date2))
+        before = before[before['rank'] > 0]
+        after = after[after['rank'] > 0]
+        common, i, j = np.intersect1d(before['title_id'], after['title_id'], return_indices=True)
+        gained = before['rank'][i].astype(np.int32) - after['rank'][j].astype(np.int32)
+        order = np.argsort(-np.abs(gained), kind='stable')[:number]
+        return [(self.titles[common[k]], int(before['rank'][i[k]]), int(after['rank'][j[k]]), int(gained[k]))
+                for k in order]
+
+    def vote_growth_rate(self, key_or_title, date1=None, date2=None):
+        """
+        Average number of new votes per day of a title between two dates.
+        :param key_or_title: IMDb title id or movie name
+        :param date1: the start date, the first snapshot if None
+        :param date2: the end date, the last snapshot if None
+        :return: float
+        """
+        days, votes = self.__trajectory(key_or_title, 'votes')
+        if len(days) == 0:
+            raise ValueError('there is no snapshot of "%s"' % key_or_title)
+        start = days[0] if date1 is None else self.__to_day(date1)
+        end = days[-1] if date2 is None else self.__to_day(date2)
+
+        if end <= start:
+            raise ValueError('the end date must be later than the start date')
+        start_index = max(np.searchsorted(days, start, side='right') - 1, 0)
+        end_index = max(np.searchsorted(days, end, side='right') - 1, 0)
+        return float(votes[end_index] - votes[start_index]) / (end - start)
@@ -2,20 +2,70 @@ import requests
 import re
 from bs4 import BeautifulSoup
 import xlwt
+import datetime
+
+try:
+    from spider_tools.snapshot_store import SnapshotStore, title_key
+except ImportError:
+    from snapshot_store import SnapshotStore, title_key
+
+try:
+    from spider_tools.page_archive import PageArchive
+except ImportError:
+    from page_archive import PageArchive
+
+try:
+    from spider_tools.poster_store import PosterStore
+except ImportError:
+    from poster_store import PosterStore
+
+try:
+    from spider_tools.subpages import SubpageCrawler
+except ImportError:
+    from subpages import SubpageCrawler
+
+try:
+    from spider_tools.work_queue import WorkQueue
+except ImportError:
+    from work_queue import WorkQueue
+
+try:
+    from spider_tools.adaptive_crawler import AdaptiveCrawler, AimdController
+except ImportError:
+    from adaptive_crawler import AdaptiveCrawler, AimdController
 
 class spider_IMDb():
-    def __init__(self, movie_number=5, savepath='.\\IMDb.xls'):
+    def __init__(self, movie_number=5, savepath='.\\IMDb.xls', snapshot_folder=None, archive_folder=None, poster_folder=None, subpages=None, subpage_concurrency=8, max_concurrency=8, timeout=30):
         '''
         Parameter initialization
         self.IMDb_chart_url provide the top 250 movies website, cannot change
         self.baseURL is the main page of imdb, cannot change
         self.savepath is the path to save result as a excel file
         self.movie_number is the number of movies user want to get, 0<number<=250
+        self.snapshot_folder is the folder of the SnapshotStore every crawl is appended to, None to keep no history
+        self.archive is the PageArchive raw title pages are saved to, None to keep no pages
+        self.poster_folder is the folder of the PosterStore the posters are fetched to, None to fetch no posters
+        self.subpages is the subpages crawled for every title (e.g. ('fullcredits', 'keywords', 'releaseinfo')), None for the title page only
+        self.subpage_concurrency is the number of subpage requests in flight at once, for all titles together
+        self.max_concurrency is the most title page requests in flight at once, the number in flight is tuned below it from the server's latency and throttling
+        self.timeout is the timeout in seconds of every request, so a stalled connection cannot hang a crawl or a worker
+        self.controller is the AimdController of the last crawl, with its current concurrency and goodput
+        self.dead_letters is the (url, error, html) of the title pages of the last crawl that failed to parse
         '''
         self.IMDb_chart_url = 'https://www.imdb.com/chart/top/'
         self.baseURL = 'https://www.imdb.com/'
         self.savepath = savepath
         self.movie_number = movie_number
+        self.snapshot_folder = snapshot_folder
+        self.archive = PageArchive(archive_folder) if archive_folder is not None else None
+        self.poster_folder = poster_folder
+        self.poster_urls = {}
+        self.subpages = subpages
+        self.subpage_concurrency = subpage_concurrency
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.controller = None
+        self.dead_letters = []
         if movie_number>250 or movie_number<=0:
             raise ValueError('movie number must in 0-250')
 
@@ -25,9 +75,21 @@ class spider_IMDb():
         get the movies' title url, return List
         '''
         #ask url
-        resp = requests.get(self.IMDb_chart_url)
+        resp = requests.get(self.IMDb_chart_url, timeout=self.timeout)
+        #keep the chart too, its order is the movies' rank when the pages are parsed again
+        if self.archive is not None:
+            self.archive.put(self.IMDb_chart_url, resp.text)
+        return spider_IMDb.__parse_url_list__(resp.text)
+
+    @staticmethod
+    def __parse_url_list__(html):
+        '''
+        Internal function, not external callable
+        Parse the movies' title url from the html of the chart, in chart order, return List
+        html: the chart's text
+        '''
         #transfer html to UTF-8
-        bs1 = BeautifulSoup(resp.text, 'html.parser')
+        bs1 = BeautifulSoup(html, 'html.parser')
         #find the class named titleColumn
         movie_url = bs1.find_all('td', attrs={'class': 'titleColumn'})
         #create the regular expression to get the title text
@@ -44,9 +106,47 @@ class spider_IMDb():
 
         '''
         #ask url
-        resp = requests.get(url)
+        resp = requests.get(url, timeout=self.timeout)
+        return self.__get_page_data__(url, resp.text)
+
+    def __get_page_data__(self, url, html):
+        '''
+        Internal function, not external callable
+        Get the movie's detail from its fetched title page, return List
+        url: the movies' url
+        html: the page's text
+        '''
+        #keep the raw page, so it can be parsed again when the markup changes
+        if self.archive is not None:
+            self.archive.put(url, html)
+        datalist = spider_IMDb.__parse_data__(html)
+        #remember the poster, it is fetched with the others after the crawl
+        poster_url = spider_IMDb.__get_poster_url__(html)
+        if poster_url:
+            self.poster_urls[datalist[0]] = poster_url
+        return datalist
+
+    @staticmethod
+    def __get_poster_url__(html):
+        '''
+        Internal function, not external callable
+        Get the poster's url from the json data of the title page, return str or None
+        html: the page's text
+        '''
+        poster_re = re.compile(r'"@type":"Movie".*?"image":"(.*?)"', re.S)
+        poster = poster_re.findall(html)
+        return poster[0] if poster else None
+
+    @staticmethod
+    def __parse_data__(html):
+        '''
+        Internal function, not external callable
+        Parse the movie's detail from the html of its title page, return List
+        html: the page's text
+
+        '''
         #transfer html to UTF-8
-        bs = BeautifulSoup(resp.text, 'html.parser')
+        bs = BeautifulSoup(html, 'html.parser')
         #find the boxoffice section
         boxoffice = bs.find('section', attrs={'data-testid': 'BoxOffice'})
         #find the techspecs section
@@ -75,17 +175,17 @@ class spider_IMDb():
         detail_re = re.compile(r'>(.*?)</a>')
 
         #get the require information
-        title = title_re.findall(resp.text)[0]
+        title = title_re.findall(html)[0]
         year = detail_re.findall(str(detail_relasedate1))[0]
-        mpr = year_mpr_re.findall(resp.text)[1] if len(year_mpr_re.findall(resp.text))==2 else ' '
+        mpr = year_mpr_re.findall(html)[1] if len(year_mpr_re.findall(html))==2 else ' '
         hours = int(hours_re.findall(str(techspace))[0]) if hours_re.findall(str(techspace)) else 0
         minutes = int(minutes_re.findall(str(techspace))[0]) if minutes_re.findall(str(techspace)) else 0
         time = hours*60+minutes
-        score = float(score_re.findall(resp.text)[0])
-        number = number_re.findall(resp.text)[0]
-        genre = genre_re.findall(resp.text)[0]
+        score = float(score_re.findall(html)[0])
+        number = number_re.findall(html)[0]
+        genre = genre_re.findall(html)[0]
         language = detail_re.findall(str(detail_language1))
-        keywords = keywords_re.findall(resp.text)[0]
+        keywords = keywords_re.findall(html)[0]
         budget = boxoffice_re.findall(str(boxoffice))[0] if boxoffice else ' '
         gross_worldwide = boxoffice_re.findall(str(boxoffice))[-1] if boxoffice else ' '
         country = detail_re.findall(str(detail_origin1))
@@ -94,11 +194,12 @@ class spider_IMDb():
         datalist = [title, year, mpr, time, score, number, genre, language, keywords, budget, gross_worldwide, country]
         return datalist
 
-    def __saveData__(self, movie_list): 
+    def __saveData__(self, movie_list, extra_columns=()): 
         '''
         Internal function, not external callable
         save data as a excel file, return None
         movie_list: a list include movie's title url
+        extra_columns: the names of the columns added after the standard ones
         '''
         print("...saving")
         #create excel
@@ -106,7 +207,7 @@ class spider_IMDb():
         #create sheet
         sheet = book.add_sheet('IWDb top250', cell_overwrite_ok = True)
         #create column list
-        col = ('Title','Year','Film rating','Time','Score','Rating Numbers','Genre','Language', 'Keywords', 'Budget', 'Gross worldwide', 'Country')
+        col = ('Title','Year','Film rating','Time','Score','Rating Numbers','Genre','Language', 'Keywords', 'Budget', 'Gross worldwide', 'Country') + tuple(extra_columns)
         #write column in excel sheet
         for i in range(len(col)):
             sheet.write(0,i,col[i])
@@ -126,17 +227,145 @@ class spider_IMDb():
         '''
         #get the url list
         url_list = self.__get_url_list__()
-        #create an empty list to save data
+        #combine the true urls, and remember every movie's chart position
+        urls = [self.baseURL+url_list[i] for i in range(0,self.movie_number)]
+        positions = {url: i+1 for i, url in enumerate(urls)}
+        #get all movies, the number of requests in flight follows the server's latency and throttling
+        print('get %d movies' % len(urls))
+        self.controller = AimdController(initial_concurrency=min(2, self.max_concurrency), max_concurrency=self.max_concurrency)
+        crawler = AdaptiveCrawler(self.__get_page_data__, self.controller, timeout=self.timeout)
+        movies = crawler.crawl(urls)
+        print('got %d movies: %s' % (len(movies), self.controller.stats()))
+        #pages that fail to parse or to fetch are reported and left out instead of stopping the crawl
+        self.dead_letters = crawler.dead_letters
+        for url, error, html in crawler.dead_letters:
+            print('failed to parse %s: %r' % (url, error))
+        for url in crawler.errors:
+            print('failed to get %s: %r' % (url, crawler.errors[url]))
+        urls = [url for url in urls if url in movies]
+        movie_list = [movies[url] for url in urls]
+        #fan out to the subpages of all movies at once, and merge them into the movies' information
+        extra_columns = []
+        if self.subpages:
+            print('get subpages')
+            crawler = SubpageCrawler(self.subpages, self.subpage_concurrency, timeout=self.timeout)
+
+            subpage_data = crawler.crawl(urls)
+            for subpage_url in crawler.errors:
+                print('failed to get %s: %r' % (subpage_url, crawler.errors[subpage_url]))
+            #the full keyword list replaces the keywords of the title page, the others are new columns
+            extra_columns = [column for column in crawler.columns() if column != 'Keywords']
+            for url, movie in zip(urls, movie_list):
+                record = subpage_data[url]
+                if record.get('Keywords'):
+                    movie[8] = record['Keywords']
+                movie.extend(record[column] for column in extra_columns)
+        #save to a excel file
+        self.__saveData__(movie_list, extra_columns)
+        print('Excel has been saved')
+        #append today's chart to the history
+        if self.snapshot_folder is not None:
+            store = SnapshotStore(self.snapshot_folder)
+            snapshot = [(title_key(url), movie[0], movie[4], movie[5]) for url, movie in zip(urls, movie_list)]
+            #the movies that failed keep the others at their chart position
+            store.add_snapshot(datetime.date.today(), snapshot, [positions[url] for url in urls])
+            print('Snapshot has been saved')
+
+        #fetch the posters concurrently
+        if self.poster_folder is not None:
+            failed = PosterStore(self.poster_folder).fetch_all(self.poster_urls)
+            for title in failed:
+                print('failed to fetch the poster of %s: %r' % (title, failed[title]))
+            print('Posters have been saved')
+
+    def create_excel_from_archive(self, urls=None, processes=None):
+
+        '''
+        callable function
+        create the excel file again from the archived pages, in parallel and without any network access
+        the rows are the first movie_number movies of the archived chart in chart order, so the archive's pages of
+        earlier crawls and of movies that left the chart are not written
+        pages that fail to parse or are not archived are reported and skipped
+        urls: the movies' title url in chart order, taken from the chart archived by the last crawl if None
+        processes: the number of worker processes, os.cpu_count() if None
+        '''
+        if self.archive is None:
+            raise ValueError('archive folder must be set to parse archived pages')
+        if urls is None:
+            if self.IMDb_chart_url not in self.archive:
+                raise ValueError('the chart is not in the archive, please give the urls in chart order')
+            url_list = spider_IMDb.__parse_url_list__(self.archive.get(self.IMDb_chart_url))
+            urls = [self.baseURL+url for url in url_list[:self.movie_number]]
+        keys = []
+        for url in urls:
+            if url in self.archive:
+                keys.append(url)
+            else:
+                print('%s is not in the archive' % url)
         movie_list = []
-        #traverse all movies
-        for i in range(0,self.movie_number):
-            print('get movie #%d'%(i+1))
-            #combine the true url
-            url = self.baseURL+url_list[i]
-            #get the one movie information
-            movie = self.__get_data__(url)
-            #save to a list
-            movie_list.append(movie)
+        #the results come back in the order of the keys
+        for url, movie in self.archive.reparse(spider_IMDb.__parse_data__, keys=keys, processes=processes):
+            if isinstance(movie, Exception):
+                print('failed to parse %s: %r' % (url, movie))
+            else:
+                movie_list.append(movie)
+        #save to a excel file
+        self.__saveData__(movie_list)
+        print('Excel has been saved')
+
+    def create_queue(self, queue_path='./crawl_queue.sqlite'):
+        '''
+        callable function
+        coordinator of a sharded crawl: put the url of every movie into the work queue
+        queue_path: the path of the SQLite file shared by the coordinator, the workers and the merge step
+        '''
+        url_list = self.__get_url_list__()
+        queue = WorkQueue(queue_path)
+        queue.enqueue([self.baseURL+url_list[i] for i in range(0,self.movie_number)])
+        print('%d movies have been queued' % self.movie_number)
+        queue.close()
+
+    def run_worker(self, queue_path='./crawl_queue.sqlite', worker=None, lease_seconds=300):
+        '''
+        callable function
+        worker of a sharded crawl: lease movies from the work queue and save their information until none is left
+        any number of workers can run at once, a crashed worker's movies are leased again after lease_seconds
+        queue_path: the path of the SQLite file
+        worker: the id of the worker, host name and process id if None
+        lease_seconds: how long a movie is reserved for this worker
+        '''
+        if worker is None:
+            worker = WorkQueue.default_worker_id()
+        queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+        while True:
+            task = queue.lease(worker)
+            if task is None:
+                break
+            position, url = task
+            print('%s get movie #%d' % (worker, position))
+            try:
+                movie = self.__get_data__(url)
+            except Exception as error:
+                print('failed to get %s: %r' % (url, error))
+                queue.fail(position, worker, repr(error))
+                continue
+            if not queue.ack(position, worker, movie):
+                print('lease of movie #%d expired, its result is dropped' % position)
+        print('%s finished: %s' % (worker, queue.progress()))
+        queue.close()
+
+    def merge_queue(self, queue_path='./crawl_queue.sqlite'):
+        '''
+        callable function
+        merge step of a sharded crawl: save the results of all workers as the excel file, in chart order
+        movies that are not done are reported and left out
+        queue_path: the path of the SQLite file
+        '''
+        queue = WorkQueue(queue_path)
+        for position, url, state, error in queue.failures():
+            print('movie #%d (%s) is %s: %s' % (position, url, state, error))
+        movie_list = [movie for position, url, movie in queue.results()]
+        queue.close()
         #save to a excel file
         self.__saveData__(movie_list)
         print('Excel has been saved')
\ No newline at end of file
@@ -0,0 +1,143 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from bs4 import BeautifulSoup
+
+
+def parse_full_credits(html):
+    '''
+    Get the directors and the cast from the full credits page, return Dict
+    html: the page's text
+    '''
+    bs = BeautifulSoup(html, 'html.parser')
+    directors = []
+    director_table = bs.find('h4', attrs={'id': 'director'})
+    if director_table is not None:
+        director_table = director_table.find_next('table')
+        directors = [a.get_text(strip=True) for a in director_table.find_all('a', href=re.compile(r'/name/'))]
+    cast = []
+    cast_table = bs.find('table', attrs={'class': 'cast_list'})
+    if cast_table is not None:
+        for row in cast_table.find_all('tr'):
+            #the actor is the only cell of a row without a class
+            cells = row.find_all('td', attrs={'class': None})
+            for cell in cells:
+                link = cell.find('a', href=re.compile(r'/name/'))
+                if link is not None and link.get_text(strip=True):
+                    cast.append(link.get_text(strip=True))
+    return {'Director': ', '.join(directors), 'Cast': ', '.join(cast)}
+
+
+def parse_keywords(html):
+    '''
+    Get every plot keyword from the keywords page, return Dict
+    html: the page's text
+    '''
+    bs = BeautifulSoup(html, 'html.parser')
+    keywords = [td['data-item-keyword'] for td in bs.find_all('td', attrs={'data-item-keyword': True})]
+    if not keywords:
+        keywords = [a.get_text(strip=True) for a in bs.find_all('a', attrs={'class': 'ipc-metadata-list-summary-item__t'})]
+    return {'Keywords': ','.join(keywords)}
+
+
+def parse_release_info(html):
+    '''
+    Get the release date in every country from the release info page, return Dict
+    html: the page's text
+    '''
+    bs = BeautifulSoup(html, 'html.parser')
+    releases = []
+    for row in bs.find_all('tr', attrs={'class': re.compile(r'release-date-item')}):
+        country = row.find('td', attrs={'class': 'release-date-item__country-name'})
+        date = row.find('td', attrs={'class': 'release-date-item__date'})
+        if country is not None and date is not None:
+            releases.append('%s: %s' % (country.get_text(strip=True), date.get_text(strip=True)))
+    return {'Release dates': '; '.join(releases)}
+
+
+# subpage name -> (path below the title url, parser, columns the parser returns)
+SUBPAGES = {
+    'fullcredits': ('fullcredits', parse_full_credits, ('Director', 'Cast')),
+    'keywords': ('keywords', parse_keywords, ('Keywords',)),
+    'releaseinfo': ('releaseinfo', parse_release_info, ('Release dates',)),
+}
+
+
+class SubpageCrawler:
+    def __init__(self, subpages=('fullcredits', 'keywords', 'releaseinfo'), max_concurrency=8, session=None, timeout=30):
+        '''
+        Parameter initialization
+        self.subpages is the names of the SUBPAGES crawled for every title
+        self.max_concurrency is the number of requests in flight at once, shared by all titles and subpages
+        self.session is the requests.Session used for all requests
+        self.timeout is the timeout of one request in seconds, so a hung request does not hold a thread of the pool
+        '''
+        for name in subpages:
+            if name not in SUBPAGES:
+                raise ValueError('unknown subpage %s, must be one of %s' % (name, ', '.join(SUBPAGES)))
+        self.subpages = subpages
+        self.max_concurrency = max_concurrency
+        self.session = session if session is not None else requests.Session()
+        self.timeout = timeout
+        self.errors = {}
+
+    def columns(self):
+        '''
+        the columns crawl() adds to every title, return List
+        '''
+        columns = []
+        for name in self.subpages:
+            columns.extend(SUBPAGES[name][2])
+        return columns
+
+    @staticmethod
+    def subpage_url(title_url, path):
+        '''
+        combine the subpage url from the title url, e.g. https://www.imdb.com/title/tt0111161/keywords
+        '''
+        title_url = title_url.split('?')[0]
+        if not title_url.endswith('/'):
+            title_url += '/'
+        return title_url + path
+
+    def __fetch(self, url, parser):
+        resp = self.session.get(url, timeout=self.timeout)
+        resp.raise_for_status()
+        return parser(resp.text)
+
+    def crawl(self, title_urls):
+        '''
+        callable function
+        fetch the subpages of all titles through one pool of max_concurrency threads, so the crawl time grows with
+        the number of requests divided by the concurrency instead of one request after another
+        urls shared by several titles are only fetched once
+        failed subpages are saved in self.errors and leave their columns empty
+        title_urls: list of the movies' url
+        return Dict, title url -> {column: value}
+        '''
+        self.errors = {}
+        jobs = {}
+        for title_url in title_urls:
+            for name in self.subpages:
+                path, parser, _ = SUBPAGES[name]
+                jobs.setdefault(self.subpage_url(title_url, path), parser)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {url: executor.submit(self.__fetch, url, parser) for url, parser in jobs.items()}
+            results = {}
+            for url, future in futures.items():
+                try:
+                    results[url] = future.result()
+                except Exception as error:
+                    # a request that failed or a page the parser does not expect loses this subpage only
+
+                    self.errors[url] = error
+                    results[url] = {}
+
+        merged = {}
+        for title_url in title_urls:
+            record = {column: '' for column in self.columns()}
+            for name in self.subpages:
+                record.update(results[self.subpage_url(title_url, SUBPAGES[name][0])])
+            merged[title_url] = record
+        return merged
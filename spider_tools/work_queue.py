@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+
+
+class WorkQueue:
+    def __init__(self, db_path='./crawl_queue.sqlite', lease_seconds=300, max_attempts=3):
+        '''
+        Parameter initialization
+        Durable queue of crawl tasks in one SQLite file, so several worker processes (on one host, or on several
+        hosts sharing the file) can split a crawl without any other service.
+        A worker leases a task for lease_seconds and acks it with its result; if the worker crashes, the lease
+        expires and the task is leased again by another worker, up to max_attempts times.
+        self.db_path is the path of the SQLite file
+        self.lease_seconds is how long a leased task is reserved for its worker
+        self.max_attempts is how many times a task is tried before it is marked as failed
+        '''
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS tasks (
+                                       position INTEGER PRIMARY KEY,
+                                       url TEXT UNIQUE NOT NULL,
+                                       state TEXT NOT NULL DEFAULT 'pending',
+                                       worker TEXT,
+                                       lease_expires REAL,
+                                       attempts INTEGER NOT NULL DEFAULT 0,
+                                       result TEXT,
+                                       error TEXT)''')
+
+    @staticmethod
+    def default_worker_id():
+        '''
+        a worker id unique across the hosts sharing the queue, return str
+        '''
+        return '%s-%d' % (socket.gethostname(), os.getpid())
+
+    def enqueue(self, urls):
+        '''
+        add tasks in order, urls already in the queue are ignored
+        urls: list of the movies' url
+        '''
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            start = self.connection.execute('SELECT COALESCE(MAX(position), 0) FROM tasks').fetchone()[0]
+            self.connection.executemany('INSERT OR IGNORE INTO tasks (position, url) VALUES (?, ?)',
+                                        [(start + i + 1, url) for i, url in enumerate(urls)])
+        except BaseException:
+            # an open transaction would keep the write lock and block every other worker
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def lease(self, worker):
+        '''
+        reserve the next pending task, or a task whose lease has expired, return (position, url) or None
+        worker: the id of the worker
+        '''
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock, so two workers never lease the same task
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.connection.execute('''SELECT position, url FROM tasks
+                                             WHERE (state = 'pending' OR (state = 'leased' AND lease_expires < ?))
+                                               AND attempts < ?
+                                             ORDER BY position LIMIT 1''', (now, self.max_attempts)).fetchone()
+            if row is None:
+                # tasks whose last lease expired on their last attempt will never be leased again
+                self.connection.execute('''UPDATE tasks SET state = 'failed', error = 'lease expired'
+                                           WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?''',
+                                        (now, self.max_attempts))
+            else:
+                self.connection.execute('''UPDATE tasks SET state = 'leased', worker = ?, lease_expires = ?,
+                                           attempts = attempts + 1 WHERE position = ?''',
+                                        (worker, now + self.lease_seconds, row[0]))
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+        return row
+
+
+    def ack(self, position, worker, result):
+        '''
+        save the result of a leased task, return whether the lease was still held by the worker
+        position: the position of the task
+        worker: the id of the worker
+        result: the result, must be json serializable
+        '''
+        cursor = self.connection.execute('''UPDATE tasks SET state = 'done', result = ?, error = NULL
+                                            WHERE position = ? AND worker = ? AND state = 'leased' ''',
+                                         (json.dumps(result, ensure_ascii=False), position, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, position, worker, error):
+        '''
+        give a leased task back after an error, it is retried until max_attempts
+        position: the position of the task
+        worker: the id of the worker
+        error: the error message
+        '''
+        self.connection.execute('''UPDATE tasks SET state = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END,
+                                   worker = NULL, lease_expires = NULL, error = ?
+                                   WHERE position = ? AND worker = ? AND state = 'leased' ''',
+                                (self.max_attempts, str(error), position, worker))
+
+    def progress(self):
+        '''
+        the number of tasks in every state, return Dict
+        '''
+        rows = self.connection.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state').fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+
+    def results(self):
+        '''
+        the results of the done tasks in queue order, return List of (position, url, result)
+        '''
+        rows = self.connection.execute("SELECT position, url, result FROM tasks WHERE state = 'done' ORDER BY position")
+        return [(position, url, json.loads(result)) for position, url, result in rows]
+
+    def failures(self):
+        '''
+        the tasks that are not done, return List of (position, url, state, error)
+        '''
+        rows = self.connection.execute("SELECT position, url, state, error FROM tasks WHERE state != 'done' ORDER BY position")
+        return rows.fetchall()
+
+    def close(self):
+        self.connection.close()